@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import responder
+
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+
+FOUNDATION_SHARE = 0.3
+FILE_MIX         = (("java", 0.80), ("yml", 0.12), ("rs", 0.04), ("json", 0.02), ("md", 0.02))
+
+MODULES = ("command", "listener", "model", "settings", "hook", "menu", "operator", "util", "api", "task")
+NOUNS   = (
+    "Player", "Channel", "Message", "Rule", "Group", "Cache", "Spy", "Mute", "Format", "Sound",
+    "Discord", "Proxy", "Tag", "Mail", "Boss", "Arena", "Region", "Reward", "Spawn", "Packet",
+)
+SUFFIXES = ("Command", "Listener", "Manager", "Settings", "Hook", "Menu", "Operator", "Util", "Handler", "Task")
+VERBS    = ("load", "save", "check", "send", "parse", "format", "register", "update", "find", "apply")
+WORDS    = (
+    "cooldown", "prefix", "enabled", "message", "delay", "radius", "limit", "channel", "format",
+    "permission", "sound", "worlds", "ignore", "broadcast", "discord", "spy", "console", "placeholder",
+)
+
+BENCHMARKED = (
+    "extract_keywords", "extract_stacktrace_classes", "extract_mentioned_files",
+    "find_class_files", "search_repos_by_keywords", "run_pre_analysis",
+)
+
+
+class SubprocessCounter:
+    """Counts processes started through subprocess.Popen (which subprocess.run
+    uses), by command name, while installed."""
+
+    def __init__(self):
+        self.counts   = {}
+        self.original = None
+
+    def __enter__(self):
+        counter       = self
+        self.original = subprocess.Popen
+
+        class CountingPopen(self.original):
+            def __init__(self, args, *rest, **kwargs):
+                name                 = os.path.basename(str(args[0] if isinstance(args, (list, tuple)) else args).split()[0])
+                counter.counts[name] = counter.counts.get(name, 0) + 1
+                super().__init__(args, *rest, **kwargs)
+
+        subprocess.Popen = CountingPopen
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen = self.original
+
+    def take(self):
+        counts, self.counts = self.counts, {}
+        return counts
+
+
+def class_name(rng):
+    return rng.choice(NOUNS) + rng.choice(NOUNS) + rng.choice(SUFFIXES)
+
+
+def java_source(rng, package, name, known_classes):
+    fields  = [f"    private {rng.choice(('int', 'String', 'boolean', 'double'))} {rng.choice(WORDS)}{i};" for i in range(rng.randint(2, 8))]
+    methods = []
+
+    for i in range(rng.randint(3, 12)):
+        verb  = rng.choice(VERBS)
+        other = rng.choice(known_classes) if known_classes else name
+        key   = f"{rng.choice(WORDS).capitalize()}.{rng.choice(WORDS).capitalize()}"
+
+        methods.append(
+            f"    public void {verb}{rng.choice(NOUNS)}{i}(final {other} {other[0].lower() + other[1:]}) {{\n"
+            f"        if (Settings.getBoolean(\"{key}\"))\n"
+            f"            Common.log(\"{verb} {rng.choice(WORDS)} for \" + {other[0].lower() + other[1:]});\n"
+            f"    }}\n"
+        )
+
+    return (
+        f"package {package};\n\n"
+        "import org.mineacademy.fo.Common;\n"
+        "import org.mineacademy.fo.settings.Settings;\n\n"
+        f"public final class {name} {{\n\n" + "\n".join(fields) + "\n\n" + "\n".join(methods) + "}\n"
+    )
+
+
+def yaml_source(rng):
+    lines = []
+
+    for section in rng.sample(WORDS, 6):
+        lines.append(f"{section.capitalize()}:")
+
+        for key in rng.sample(WORDS, 5):
+            lines.append(f"  {key.capitalize()}: {rng.choice(('true', 'false', '20', repr(rng.choice(WORDS))))}")
+
+    return "\n".join(lines) + "\n"
+
+
+def rule_source(rng):
+    blocks = []
+
+    for i in range(rng.randint(3, 10)):
+        comment = "#" if rng.random() < 0.3 else ""
+        blocks.append(f"{comment}match \\b{rng.choice(WORDS)}{i}\\b\nname {rng.choice(WORDS)}-{i}\nthen warn Do not {rng.choice(VERBS)} {rng.choice(WORDS)}\nthen deny\n")
+
+    return "\n".join(blocks)
+
+
+def generate_tree(root, total_files, seed):
+    """Write a synthetic plugin checkout (main/) and Foundation library
+    (foundation/) of about `total_files` files. Returns the generated Java
+    class names per root, for building issues that reference real classes."""
+
+    rng     = random.Random(seed)
+    classes = {}
+
+    for repo, share, package_root in (
+        (responder.FOUNDATION_DIR, FOUNDATION_SHARE, "org.mineacademy.fo"),
+        (responder.MAIN_DIR, 1 - FOUNDATION_SHARE, "org.mineacademy.bench"),
+    ):
+        count = int(total_files * share)
+        names = []
+
+        for kind, ratio in FILE_MIX:
+            for i in range(int(count * ratio)):
+                module = MODULES[i % len(MODULES)]
+                depth  = "/".join(f"sub{(i // 200) % 7}" for _ in range(i % 3))
+
+                if kind == "java":
+                    name      = f"{class_name(rng)}{i}"
+                    package   = ".".join(filter(None, (package_root, module, depth.replace("/", "."))))
+                    directory = Path(root, repo, "src/main/java", *package.split("."))
+                    path      = directory / f"{name}.java"
+                    text      = java_source(rng, package, name, names[-50:])
+                    names.append(name)
+                elif kind == "yml":
+                    path = Path(root, repo, "src/main/resources", module, depth, f"{rng.choice(WORDS)}-{i}.yml")
+                    text = yaml_source(rng)
+                elif kind == "rs":
+                    path = Path(root, repo, "src/main/resources/rules", f"{rng.choice(WORDS)}-{i}.rs")
+                    text = rule_source(rng)
+                elif kind == "json":
+                    path = Path(root, repo, "src/main/resources/lang", f"{rng.choice(WORDS)}-{i}.json")
+                    text = json.dumps({w: {"value": rng.choice(WORDS)} for w in rng.sample(WORDS, 5)}, indent=2)
+                else:
+                    path = Path(root, repo, "docs", f"{rng.choice(WORDS)}-{i}.md")
+                    text = " ".join(rng.choice(WORDS) for _ in range(200))
+
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(text)
+
+        classes[repo] = names
+
+    return classes
+
+
+def commit_tree(root):
+    for repo in (responder.MAIN_DIR, responder.FOUNDATION_DIR):
+        directory = os.path.join(root, repo)
+
+        for args in (["init", "-q"], ["add", "-A"], ["-c", "user.name=bench", "-c", "user.email=bench@localhost", "commit", "-q", "-m", "Synthetic tree"]):
+            subprocess.run(["git", "-C", directory, *args], check=True, capture_output=True)
+
+
+def stacktrace(rng, classes, frames):
+    lines = [f"[Server thread/ERROR]: Could not pass event to {rng.choice(classes[responder.MAIN_DIR])}", "java.lang.NullPointerException: Cannot invoke \"String.length()\" because \"message\" is null"]
+
+    for i in range(frames):
+        if rng.random() < 0.4:
+            repo  = rng.choice((responder.MAIN_DIR, responder.FOUNDATION_DIR))
+            owner = "org.mineacademy.bench" if repo == responder.MAIN_DIR else "org.mineacademy.fo"
+            name  = rng.choice(classes[repo])
+            lines.append(f"\tat {owner}.{rng.choice(MODULES)}.{name}.{rng.choice(VERBS)}({name}.java:{rng.randint(10, 900)}) ~[?:?]")
+        else:
+            lines.append(f"\tat net.minecraft.server.v1_20_R3.{rng.choice(NOUNS)}Connection.a({rng.choice(NOUNS)}Connection.java:{rng.randint(10, 2000)}) ~[paper-1.20.4.jar:?]")
+
+    return "\n".join(lines)
+
+
+def issue_corpus(classes, seed):
+    """Issue titles and bodies of the shapes the responder sees: a short config
+    question, a question naming files, a crash with a stacktrace, and a long
+    log paste with several traces."""
+
+    rng = random.Random(seed)
+
+    def prose(words):
+        return " ".join(rng.choice(WORDS + NOUNS) for _ in range(words))
+
+    return [
+        ("short question", "How do I disable the join message?", f"I tried setting {rng.choice(WORDS)} to false but it still shows. {prose(40)}"),
+        ("mentions files", "Rules not applying", f"My settings.yml and rules/{rng.choice(WORDS)}-3.rs look right. {rng.choice(classes[responder.MAIN_DIR])}.java seems to ignore Channels.Format. {prose(120)}"),
+        ("crash", "NPE when sending a message", f"Happens on every join.\n\n```\n{stacktrace(rng, classes, 60)}\n```\n\n{prose(80)}"),
+        ("log paste", "Server crashes randomly", "\n\n".join(f"```\n{stacktrace(rng, classes, 120)}\n```\n{prose(60)}" for _ in range(8))),
+    ]
+
+
+def reset_indexes(index_dir):
+    """Drop the in-process indexes so the next lookup reloads them from
+    `index_dir`, as a fresh responder process would."""
+
+    responder.INDEX_DIR     = str(index_dir)
+    responder.indexed_heads = None
+    responder.drop_stale_caches()
+
+
+def measure(function, counter, repeat):
+    timings = []
+
+    counter.take()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result  = function()
+            timings.append(time.perf_counter() - started)
+
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+        "results": len(result),
+        "subprocesses_per_call": {name: count / repeat for name, count in counter.take().items()},
+    }
+
+
+def bench_size(workdir, size, repeat, seed, use_git):
+    root = Path(workdir) / f"tree-{size}"
+
+    if root.exists():
+        shutil.rmtree(root)
+
+    started = time.perf_counter()
+    classes = generate_tree(root, size, seed)
+
+    if use_git:
+        commit_tree(root)
+
+    generated = time.perf_counter() - started
+    index_dir = root / ".index-cache"
+    issues    = issue_corpus(classes, seed)
+    result    = {"files": size, "generate_seconds": round(generated, 2), "indexes": {}, "issues": {}}
+
+    os.chdir(root)
+
+    with SubprocessCounter() as counter:
+        for label in ("cold build", "load from disk"):
+            reset_indexes(index_dir)
+            counter.take()
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                responder.get_file_index()
+                files   = time.perf_counter() - started
+                responder.get_search_index()
+                search  = time.perf_counter() - started - files
+
+            result["indexes"][label] = {
+                "file_index_ms": round(files * 1000, 1),
+                "search_index_ms": round(search * 1000, 1),
+                "subprocesses": counter.take(),
+            }
+
+        for label, title, body in issues:
+            keywords = responder.extract_keywords(title, body)
+            names    = responder.extract_stacktrace_classes(body)
+            calls    = {
+                "extract_keywords": lambda: responder.extract_keywords(title, body),
+                "extract_stacktrace_classes": lambda: responder.extract_stacktrace_classes(body),
+                "extract_mentioned_files": lambda: responder.extract_mentioned_files(body),
+                "find_class_files": lambda: responder.find_class_files(names),
+                "search_repos_by_keywords": lambda: responder.search_repos_by_keywords(keywords),
+                "run_pre_analysis": lambda: asyncio.run(responder.run_pre_analysis(title, body)),
+            }
+
+            result["issues"][label] = {"body_chars": len(body), **{name: measure(calls[name], counter, repeat) for name in BENCHMARKED}}
+
+    return result
+
+
+def print_result(result):
+    print(f"\n{result['files']:,} files (generated in {result['generate_seconds']}s)")
+
+    for label, stats in result["indexes"].items():
+        spawned = ", ".join(f"{n} {name}" for name, n in sorted(stats["subprocesses"].items())) or "none"
+        print(f"  index {label:<15} file {stats['file_index_ms']:>9.1f} ms   search {stats['search_index_ms']:>9.1f} ms   subprocesses: {spawned}")
+
+    print(f"  {'function':<28}" + "".join(f"{label:>18}" for label in result["issues"]))
+
+    for name in BENCHMARKED:
+        cells = []
+
+        for stats in result["issues"].values():
+            spawned = sum(stats[name]["subprocesses_per_call"].values())
+            cells.append(f"{stats[name]['median_ms']:>10.2f} ms" + (f" +{spawned:g}p" if spawned else "   "))
+
+        print(f"  {name:<28}" + "".join(f"{cell:>18}" for cell in cells))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the pre-analysis stages over synthetic plugin trees of several sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="total files per synthetic tree (main/ plus foundation/)")
+    parser.add_argument("--repeat", type=int, default=5, help="calls per function and issue; the median and max are reported")
+    parser.add_argument("--seed", type=int, default=1, help="random seed of the generated trees and issues")
+    parser.add_argument("--workdir", help="directory for the generated trees (default: a temporary directory, removed afterwards)")
+    parser.add_argument("--no-git", action="store_true", help="do not commit the trees, so indexes are always rebuilt as for a non-git checkout")
+    parser.add_argument("--report", help="write all measurements to this JSON file")
+
+    return parser.parse_args()
+
+
+def main():
+    args    = parse_args()
+    report  = Path(args.report).resolve() if args.report else None
+    workdir = Path(args.workdir).resolve() if args.workdir else Path(tempfile.mkdtemp(prefix="bench-preanalysis-"))
+    cwd     = os.getcwd()
+
+    responder.project_id_global = "bench"
+
+    results = []
+
+    try:
+        for size in args.sizes:
+            results.append(bench_size(workdir, size, args.repeat, args.seed, not args.no_git))
+            print_result(results[-1])
+    finally:
+        os.chdir(cwd)
+
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if report:
+        report.write_text(json.dumps(results, indent=2))
+        print(f"\nBenchmark report written to {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,726 @@
+import gzip
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from re import _parser as regex_parser
+
+
+SEARCHABLE_EXTENSIONS = (".java", ".yml", ".yaml", ".rs", ".json")
+SKIPPED_DIRS          = frozenset({"target", ".git"})
+
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 64
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+INDEX_MAGIC    = b"AISIDX01"
+HEADER_FORMAT  = struct.Struct("<8sIIQQQ")
+TERM_FORMAT    = struct.Struct("<QHQI")
+POSTING_FORMAT = struct.Struct("<II")
+
+REPEAT_OPCODES = (regex_parser.MAX_REPEAT, regex_parser.MIN_REPEAT)
+
+FILE_INDEX_VERSION = 1
+
+MANIFEST_NAME               = "manifest.json"
+MAX_INCREMENTAL_CHANGES     = 1000
+MAX_INCREMENTAL_GENERATIONS = 50
+
+
+def repo_head_sha(repo_dir):
+    try:
+        result = subprocess.run(
+            ["git", "-C", repo_dir, "rev-parse", "HEAD"],
+            capture_output=True, text=True, timeout=10,
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return ""
+
+    if result.returncode != 0:
+        return ""
+
+    return result.stdout.strip()
+
+
+class FileIndex:
+    """Every file under `roots` (build output excluded), collected in one walk
+    or restored from a snapshot written by `save`.
+
+    Answers basename, path-suffix and directory-listing lookups from memory so
+    stacktrace and filename resolution never re-walk the trees.
+    """
+
+    def __init__(self, roots, sizes=None):
+        self.roots   = tuple(roots)
+        self.sizes   = {}
+        self.by_name = {}
+        self.dirs    = {}
+
+        if sizes is not None:
+            for root in self.roots:
+                self.dirs[root] = set()
+
+            for path, size in sizes.items():
+                self._add_parents(os.path.dirname(path))
+                self._add_file(path, size)
+
+            return
+
+        for root in self.roots:
+            if os.path.isdir(root):
+                self._walk(root)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp  = path.with_suffix(path.suffix + ".tmp")
+
+        with gzip.open(tmp, "wt") as f:
+            json.dump({"version": FILE_INDEX_VERSION, "sizes": self.sizes}, f)
+
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, roots):
+        with gzip.open(path, "rt") as f:
+            data = json.load(f)
+
+        if data.get("version") != FILE_INDEX_VERSION:
+            raise ValueError(f"unsupported file index version {data.get('version')}")
+
+        return cls(roots, data["sizes"])
+
+    def _walk(self, directory):
+        self.dirs.setdefault(directory, set())
+
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+
+        for entry in entries:
+            if entry.name in SKIPPED_DIRS:
+                continue
+
+            path = os.path.join(directory, entry.name)
+
+            if entry.is_dir(follow_symlinks=False):
+                self.dirs[directory].add(entry.name + "/")
+                self._walk(path)
+            elif entry.is_file():
+                self._add_file(path, entry.stat().st_size)
+
+    def _add_file(self, path, size):
+        parent, name = os.path.split(path)
+
+        if path not in self.sizes:
+            self.by_name.setdefault(name, []).append(path)
+
+        self.sizes[path] = size
+        self.dirs.setdefault(parent, set()).add(name)
+
+    def _add_parents(self, directory):
+        if not directory or directory in self.dirs:
+            return
+
+        parent, name       = os.path.split(directory)
+        self.dirs[directory] = set()
+
+        if parent:
+            self._add_parents(parent)
+            self.dirs[parent].add(name + "/")
+
+    def covers(self, path):
+        parts = Path(path).parts
+
+        return bool(parts) and parts[0] in self.roots and not SKIPPED_DIRS.intersection(parts)
+
+    def refresh(self, path):
+        path = os.path.normpath(path)
+
+        if not self.covers(path):
+            return
+
+        if os.path.isfile(path):
+            self._add_parents(os.path.dirname(path))
+            self._add_file(path, os.path.getsize(path))
+            return
+
+        if path not in self.sizes:
+            return
+
+        parent, name = os.path.split(path)
+        del self.sizes[path]
+        self.by_name[name].remove(path)
+        self.dirs[parent].discard(name)
+
+        while parent not in self.roots and not self.dirs.get(parent) and not os.path.isdir(parent):
+            grandparent, name = os.path.split(parent)
+            del self.dirs[parent]
+            self.dirs[grandparent].discard(name + "/")
+            parent = grandparent
+
+    def paths(self, extensions=None):
+        return sorted(p for p in self.sizes if extensions is None or p.endswith(extensions))
+
+    def find_by_name(self, filename):
+        return sorted(self.by_name.get(filename, []))
+
+    def find_by_suffix(self, suffix):
+        suffix = suffix.strip().lstrip("./")
+
+        if not suffix:
+            return []
+
+        return [p for p in self.find_by_name(os.path.basename(suffix)) if p == suffix or p.endswith("/" + suffix)]
+
+    def list_dir(self, directory):
+        """Return sorted (name, size) entries of an indexed directory, with size None
+        for subdirectories (whose names end in '/'), or None if it is not indexed."""
+
+        directory = os.path.normpath(directory)
+
+        if directory not in self.dirs:
+            return None
+
+        entries = []
+
+        for name in sorted(self.dirs[directory], key=lambda n: n.rstrip("/")):
+            size = None if name.endswith("/") else self.sizes.get(os.path.join(directory, name), 0)
+            entries.append((name, size))
+
+        return entries
+
+
+def tokenize(text):
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group()
+
+        if len(token) < MIN_TOKEN_LENGTH or len(token) > MAX_TOKEN_LENGTH:
+            continue
+
+        yield token.lower()
+
+        parts = CAMEL_PATTERN.findall(token)
+
+        if len(parts) < 2:
+            continue
+
+        for part in parts:
+            if len(part) >= MIN_TOKEN_LENGTH:
+                yield part.lower()
+
+
+def keyword_terms(keyword):
+    """Split a free-form keyword into the index terms that must all be present
+    in a file for it to match, mirroring the substring semantics of `grep -i`
+    closely enough for ranking: `PlayerCache` matches files containing that
+    identifier or both `player` and `cache`, dotted names match on every part."""
+
+    tokens = [t for t in TOKEN_PATTERN.findall(keyword) if MIN_TOKEN_LENGTH <= len(t) <= MAX_TOKEN_LENGTH]
+
+    if len(tokens) == 1:
+        parts = [p.lower() for p in CAMEL_PATTERN.findall(tokens[0]) if len(p) >= MIN_TOKEN_LENGTH]
+        return [tokens[0].lower()], parts if len(parts) > 1 else []
+
+    return [t.lower() for t in tokens], []
+
+
+class SearchIndex:
+    """Read-only token -> postings index over a fixed file set, memory-mapped from disk.
+
+    Layout: header | file paths (newline separated) | term strings | term table
+    (sorted by term bytes) | postings of (file id, term frequency) pairs.
+    """
+
+    def __init__(self, path):
+        self.path   = Path(path)
+        self.handle = open(self.path, "rb")
+        self.mm     = mmap.mmap(self.handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, n_files, n_terms, files_off, terms_off, postings_off = HEADER_FORMAT.unpack_from(self.mm, 0)
+
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"Not a search index: {path}")
+
+        files_len  = struct.unpack_from("<Q", self.mm, HEADER_FORMAT.size)[0]
+        files_blob = self.mm[files_off:files_off + files_len]
+
+        self.files        = files_blob.decode("utf-8").split("\n") if n_files else []
+        self.n_terms      = n_terms
+        self.terms_off    = terms_off
+        self.postings_off = postings_off
+
+    def close(self):
+        self.mm.close()
+        self.handle.close()
+
+    def _term_at(self, i):
+        term_off, term_len, postings_off, df = TERM_FORMAT.unpack_from(self.mm, self.terms_off + i * TERM_FORMAT.size)
+        return self.mm[term_off:term_off + term_len], postings_off, df
+
+    def postings(self, term):
+        target = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_term, postings_off, df = self._term_at(mid)
+
+            if mid_term == target:
+                return {
+                    file_id: tf
+                    for file_id, tf in POSTING_FORMAT.iter_unpack(self.mm[postings_off:postings_off + df * POSTING_FORMAT.size])
+                }
+
+            if mid_term < target:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return {}
+
+    def iter_postings(self):
+        """Yield (term, [(file id, term frequency)]) for every term, in term order."""
+
+        for i in range(self.n_terms):
+            term, postings_off, df = self._term_at(i)
+            yield term.decode("utf-8"), list(POSTING_FORMAT.iter_unpack(self.mm[postings_off:postings_off + df * POSTING_FORMAT.size]))
+
+    def _match(self, terms):
+        matched = None
+
+        for term in terms:
+            hits = self.postings(term)
+
+            if matched is None:
+                matched = hits
+            else:
+                matched = {f: min(tf, hits[f]) for f, tf in matched.items() if f in hits}
+
+            if not matched:
+                return {}
+
+        return matched or {}
+
+    def rank(self, keywords, limit):
+        scores = {}
+        total  = max(len(self.files), 1)
+
+        for keyword in keywords:
+            terms, parts = keyword_terms(keyword)
+
+            if not terms:
+                continue
+
+            matched = self._match(terms)
+
+            if parts:
+                for file_id, tf in self._match(parts).items():
+                    matched[file_id] = max(matched.get(file_id, 0), tf)
+
+            if not matched:
+                continue
+
+            idf = math.log(1 + total / len(matched))
+
+            for file_id, tf in matched.items():
+                scores[file_id] = scores.get(file_id, 0.0) + (1 + math.log(tf)) * idf
+
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], self.files[x[0]]))
+        return [self.files[file_id] for file_id, _ in ranked[:limit]]
+
+
+class CodeCorpus:
+    """Contents of every searchable file under `roots`, read from disk once per run.
+
+    Files come from a FileIndex walk. Extensions are loaded lazily the first
+    time a search asks for them, and
+    individual paths are re-read through `refresh` after a tool writes to them.
+    """
+
+    def __init__(self, file_index, extensions=SEARCHABLE_EXTENSIONS):
+        self.file_index = file_index
+        self.texts      = {}
+        self.loaded     = set()
+
+        self.load(extensions)
+
+    def load(self, extensions):
+        missing = tuple(ext for ext in extensions if ext not in self.loaded)
+
+        if not missing:
+            return
+
+        for path in self.file_index.paths(missing):
+            self._read(path)
+
+        self.loaded.update(missing)
+
+    def _read(self, path):
+        try:
+            self.texts[path] = Path(path).read_text(errors="replace")
+        except OSError:
+            self.texts.pop(path, None)
+
+    def read_text(self, path):
+        if path in self.texts:
+            return self.texts[path]
+
+        return Path(path).read_text(errors="replace")
+
+    def refresh(self, path):
+        path = os.path.normpath(path)
+
+        if not os.path.isfile(path):
+            self.texts.pop(path, None)
+            return
+
+        if path.endswith(tuple(self.loaded)) and self.file_index.covers(path):
+            self._read(path)
+
+    def search(self, query, extensions, regex=False, max_per_file=3, limit=50, timeout=None):
+        """Return up to `limit` + 1 grep-style `path:line:snippet` matches, at most
+        `max_per_file` per file, so callers can tell whether results were cut off.
+        Raises TimeoutError once the scan has run for `timeout` seconds."""
+
+        self.load(extensions)
+
+        matches  = compile_search_pattern(query).search if regex else (lambda text: query in text)
+        deadline = time.monotonic() + timeout if timeout else None
+        results  = []
+
+        for path in sorted(self.texts):
+            if not path.endswith(extensions):
+                continue
+
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError(f"search ran for more than {timeout} seconds")
+
+            text = self.texts.get(path, "")
+
+            if not matches(text):
+                continue
+
+            hits = 0
+
+            for line_number, line in enumerate(text.splitlines(), 1):
+                if not matches(line):
+                    continue
+
+                results.append(f"{path}:{line_number}:{line}")
+                hits += 1
+
+                if len(results) > limit:
+                    return results
+
+                if hits >= max_per_file:
+                    break
+
+        return results
+
+
+def has_nested_repeat(parsed, inside_repeat=False):
+    """Whether a parsed pattern repeats a group that itself holds an unbounded
+    repeat, like `(a+)+` or `(?:\\w+\\s?)*`, which backtracks exponentially on
+    lines that almost match."""
+
+    for opcode, argument in parsed:
+        if opcode in REPEAT_OPCODES:
+            _, high, body = argument
+
+            if inside_repeat and high == regex_parser.MAXREPEAT:
+                return True
+
+            if has_nested_repeat(body, inside_repeat or high > 1):
+                return True
+        elif any(has_nested_repeat(sub, inside_repeat) for sub in _subpatterns(argument)):
+            return True
+
+    return False
+
+
+def _subpatterns(argument):
+    if isinstance(argument, regex_parser.SubPattern):
+        yield argument
+    elif isinstance(argument, (tuple, list)):
+        for item in argument:
+            yield from _subpatterns(item)
+
+
+def compile_search_pattern(query):
+    """Compile a model-supplied search regex, rejecting the nested repeats that
+    could keep a scan of the whole corpus busy indefinitely."""
+
+    if has_nested_repeat(regex_parser.parse(query)):
+        raise re.error("nested repeats such as (a+)+ are not allowed, repeat a single token or use a literal search")
+
+    return re.compile(query, re.MULTILINE)
+
+
+def _index_files(paths, files, postings, read_text):
+    for path in paths:
+        try:
+            text = read_text(path)
+        except OSError:
+            continue
+
+        file_id = len(files)
+        counts  = {}
+        files.append(path)
+
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((file_id, tf))
+
+
+def build_search_index(paths, out_path, read_text=None):
+    """Tokenize every file once and write a SearchIndex to out_path atomically."""
+
+    files    = []
+    postings = {}
+
+    _index_files(paths, files, postings, read_text or (lambda p: Path(p).read_text(errors="replace")))
+    write_search_index(files, postings, out_path)
+
+
+def update_search_index(index, removed, added, out_path, read_text=None):
+    """Write a copy of `index` without the `removed` paths and with the `added`
+    ones tokenized afresh, so only changed files are read again. A changed file
+    belongs in both lists."""
+
+    removed  = set(removed)
+    kept     = [file_id for file_id, path in enumerate(index.files) if path not in removed]
+    remap    = {old_id: new_id for new_id, old_id in enumerate(kept)}
+    files    = [index.files[file_id] for file_id in kept]
+    postings = {}
+
+    for term, entries in index.iter_postings():
+        entries = [(remap[file_id], tf) for file_id, tf in entries if file_id in remap]
+
+        if entries:
+            postings[term] = entries
+
+    _index_files(added, files, postings, read_text or (lambda p: Path(p).read_text(errors="replace")))
+    write_search_index(files, postings, out_path)
+
+
+def write_search_index(files, postings, out_path):
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    files_blob = "\n".join(files).encode("utf-8")
+    terms      = sorted((t.encode("utf-8"), t) for t in postings)
+    term_blob  = bytearray()
+    term_spans = []
+
+    for encoded, _ in terms:
+        term_spans.append((len(term_blob), len(encoded)))
+        term_blob.extend(encoded)
+
+    files_off    = HEADER_FORMAT.size + 8
+    strings_off  = files_off + len(files_blob)
+    terms_off    = strings_off + len(term_blob)
+    postings_off = terms_off + len(terms) * TERM_FORMAT.size
+
+    table    = bytearray()
+    body     = bytearray()
+    position = postings_off
+
+    for (encoded, term), (rel_off, length) in zip(terms, term_spans):
+        entries = postings[term]
+        table.extend(TERM_FORMAT.pack(strings_off + rel_off, length, position, len(entries)))
+
+        for file_id, tf in entries:
+            body.extend(POSTING_FORMAT.pack(file_id, tf))
+
+        position += len(entries) * POSTING_FORMAT.size
+
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER_FORMAT.pack(INDEX_MAGIC, len(files), len(terms), files_off, terms_off, postings_off))
+        f.write(struct.pack("<Q", len(files_blob)))
+        f.write(files_blob)
+        f.write(term_blob)
+        f.write(table)
+        f.write(body)
+
+    os.replace(tmp_path, out_path)
+
+
+def changed_paths(root, old_sha, new_sha):
+    """Files of the `root` checkout that differ between two commits, prefixed with
+    `root` like FileIndex paths, or None when the diff cannot be computed.
+
+    Shallow clones usually lack the old commit, so it is fetched on its own
+    first; the diff only needs both trees, not the history between them.
+    """
+
+    def git(*args, timeout=30):
+        return subprocess.run(["git", "-C", root, *args], capture_output=True, text=True, timeout=timeout)
+
+    try:
+        if git("cat-file", "-e", f"{old_sha}^{{commit}}").returncode != 0:
+            git("fetch", "--quiet", "--depth", "1", "origin", old_sha, timeout=120)
+
+        result = git("diff", "--name-only", "--no-renames", "-z", old_sha, new_sha)
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+
+    if result.returncode != 0:
+        return None
+
+    return [os.path.join(root, name) for name in result.stdout.split("\0") if name]
+
+
+class IndexCache:
+    """Index artifacts of one project, stored in `cache_dir/<project>` with a
+    manifest of the HEAD SHAs of `roots` each artifact was last brought up to.
+
+    An artifact at the current SHAs is loaded as is. One from older commits is
+    updated from `git diff --name-only` against its SHAs when few files changed,
+    and rebuilt otherwise. Repeated incremental updates are capped so drift
+    from name-based references cannot accumulate forever. Roots outside git
+    are rebuilt on every run.
+    """
+
+    def __init__(self, cache_dir, project_id, roots):
+        self.dir   = Path(cache_dir) / "projects" / (project_id or "default")
+        self.roots = tuple(roots)
+        self.heads = {root: repo_head_sha(root) for root in self.roots}
+        self.diffs = {}
+
+    def reusable(self):
+        return all(self.heads.values())
+
+    def read_manifest(self):
+        try:
+            return json.loads((self.dir / MANIFEST_NAME).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, name, generation):
+        manifest = self.read_manifest()
+
+        if generation is None:
+            manifest.pop(name, None)
+        else:
+            manifest[name] = {"heads": self.heads, "generation": generation, "updated_at": time.time()}
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile("w", dir=self.dir, suffix=".tmp", delete=False) as f:
+            json.dump(manifest, f, indent=2)
+
+        os.replace(f.name, self.dir / MANIFEST_NAME)
+
+    def changes_since(self, heads):
+        """Sorted paths changed since the commits in `heads`, or None if unknown."""
+
+        changed = set()
+
+        for root in self.roots:
+            old_sha, new_sha = heads.get(root), self.heads[root]
+
+            if old_sha == new_sha:
+                continue
+
+            if not old_sha:
+                return None
+
+            if (root, old_sha) not in self.diffs:
+                self.diffs[(root, old_sha)] = changed_paths(root, old_sha, new_sha)
+
+            if self.diffs[(root, old_sha)] is None:
+                return None
+
+            changed.update(self.diffs[(root, old_sha)])
+
+        return sorted(changed)
+
+    def artifact(self, name, load, build, update):
+        """Return (artifact, how it was obtained) for the file `name`.
+
+        `load(path)` opens a stored artifact, `build(path)` creates one from the
+        checkouts and `update(artifact, changed_paths, path)` applies a diff to a
+        loaded one; both of the latter must persist their result to `path`.
+        """
+
+        path  = self.dir / name
+        entry = self.read_manifest().get(name)
+
+        if not self.reusable():
+            self.record(name, None)
+            return build(path), "built (not a git checkout)"
+
+        if entry and path.exists():
+            current     = entry["heads"] == self.heads
+            changed     = [] if current else self.changes_since(entry["heads"])
+            incremental = changed is not None and len(changed) <= MAX_INCREMENTAL_CHANGES and entry["generation"] < MAX_INCREMENTAL_GENERATIONS
+
+            if current or incremental:
+                try:
+                    stored = load(path)
+                except (OSError, ValueError, KeyError, EOFError, struct.error) as e:
+                    print(f"Warning: Discarding unreadable index {path}: {e}")
+                else:
+                    if current:
+                        return stored, "loaded"
+
+                    artifact = update(stored, changed, path) if changed else stored
+                    self.record(name, entry["generation"] + 1)
+
+                    return artifact, f"updated from {len(changed)} changed file(s)"
+
+        artifact = build(path)
+        self.record(name, 0)
+
+        return artifact, "built"
+
+
+def load_or_build_file_index(cache):
+    def build(path):
+        index = FileIndex(cache.roots)
+        index.save(path)
+        return index
+
+    def update(index, changed, path):
+        for changed_path in changed:
+            index.refresh(changed_path)
+
+        index.save(path)
+        return index
+
+    return cache.artifact("files.json.gz", lambda path: FileIndex.load(path, cache.roots), build, update)
+
+
+def load_or_build_search_index(cache, file_index, corpus_factory):
+    """Open the search index for the current commits, building it on first use
+    and re-tokenizing only changed files when an older one is cached."""
+
+    def build(path):
+        corpus = corpus_factory()
+        build_search_index(file_index.paths(SEARCHABLE_EXTENSIONS), path, read_text=corpus.read_text)
+        return SearchIndex(path)
+
+    def update(index, changed, path):
+        added = [p for p in changed if p in file_index.sizes and p.endswith(SEARCHABLE_EXTENSIONS)]
+
+        update_search_index(index, changed, added, path)
+        index.close()
+
+        return SearchIndex(path)
+
+    return cache.artifact("search.idx", SearchIndex, build, update)
@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def comment_key(comment, position):
+    """Stable identifier of a comment: its GitHub id, or its position in the
+    thread for exports that carry no ids."""
+
+    return str(comment.get("id") or f"#{position}")
+
+
+class ConversationStore:
+    """Rolling summaries of long issue threads, one JSON file per issue.
+
+    Each entry records the summary text and the key of the last comment it
+    covers, so the next run only has to fold in comments that arrived after
+    that one. Threads whose comments were edited away fall back to a fresh
+    summary because the recorded comment can no longer be found.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def entry_path(self, issue_number):
+        return self.directory / f"{issue_number}.json"
+
+    def load(self, issue_number):
+        try:
+            return json.loads(self.entry_path(issue_number).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, issue_number, summary, through, count):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile("w", dir=self.directory, suffix=".tmp", delete=False) as f:
+            json.dump({"summary": summary, "through": through, "count": count, "updated_at": time.time()}, f, indent=2)
+
+        os.replace(f.name, self.entry_path(issue_number))
+
+    def pending(self, issue_number, older):
+        """Return (previous summary, comments not yet summarized) for the `older`
+        part of a thread. The previous summary is "" when nothing usable is stored."""
+
+        entry = self.load(issue_number)
+
+        if not entry:
+            return "", older
+
+        keys = [comment_key(c, i) for i, c in enumerate(older)]
+
+        if entry.get("through") not in keys:
+            return "", older
+
+        return entry["summary"], older[keys.index(entry["through"]) + 1:]
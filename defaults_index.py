@@ -0,0 +1,240 @@
+import fnmatch
+import gzip
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+from java_index import parse_java, yaml_key_lines
+
+
+DEFAULTS_INDEX_VERSION = 1
+
+MAX_KEY_DEPTH     = 2
+MAX_DETAIL_LENGTH = 160
+
+RULE_START_PATTERN  = re.compile(r"^\s*(#)?\s*(match|group)\s+(.+?)\s*$")
+RULE_LINE_PATTERN   = re.compile(r"^\s*(#)?\s*(\w+)\s*(.*?)\s*$")
+SUPER_LABEL_PATTERN = re.compile(r"\bsuper\s*\(\s*\"([^\"]+)\"")
+DESCRIPTION_PATTERN = re.compile(r"\bsetDescription\s*\(\s*\"([^\"]*)\"")
+
+
+def _shorten(text):
+    return text if len(text) <= MAX_DETAIL_LENGTH else text[:MAX_DETAIL_LENGTH - 3] + "..."
+
+
+def digest_rule_file(text):
+    """Rules and groups of a `.rs` file, each named by its `name` operator or
+    its match pattern, with its `then` actions. Blocks whose header line is
+    commented out ship as inactive templates."""
+
+    entries = []
+    block   = None
+
+    for number, line in enumerate(text.splitlines(), 1):
+        start = RULE_START_PATTERN.match(line)
+
+        if start:
+            commented, keyword, value = start.groups()
+            block = {"kind": "rule" if keyword == "match" else "group", "name": value, "line": number, "active": not commented, "then": []}
+            entries.append(block)
+            continue
+
+        if not line.strip():
+            block = None
+            continue
+
+        operator = RULE_LINE_PATTERN.match(line)
+
+        if block is None or not operator:
+            continue
+
+        _, word, value = operator.groups()
+
+        if word == "name" and block["kind"] == "rule":
+            block["name"] = value
+        elif word == "then":
+            block["then"].append(value)
+
+    return [
+        [e["kind"], e["name"], e["line"], _shorten("then " + "; then ".join(e["then"])) if e["then"] else "", e["active"]]
+        for e in entries
+    ]
+
+
+def digest_yaml_file(text):
+    return [["key", key, line, "", True] for key, line in yaml_key_lines(text) if key.count(".") < MAX_KEY_DEPTH]
+
+
+def digest_json_file(text):
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return []
+
+    entries = []
+
+    def walk(value, prefix, depth):
+        if not isinstance(value, dict) or depth >= MAX_KEY_DEPTH:
+            return
+
+        for key, child in value.items():
+            path   = f"{prefix}.{key}" if prefix else key
+            offset = text.find(f'"{key}"')
+            detail = _shorten(child) if isinstance(child, str) else ""
+
+            entries.append(["key", path, text.count("\n", 0, offset) + 1 if offset >= 0 else 0, detail, True])
+            walk(child, path, depth + 1)
+
+    walk(data, "", 0)
+
+    return entries
+
+
+def digest_command_file(text):
+    """Command classes of one Java file with their labels (the first `super("...")`
+    argument) and description."""
+
+    labels      = SUPER_LABEL_PATTERN.findall(text)
+    description = DESCRIPTION_PATTERN.search(text)
+    detail      = ", ".join(filter(None, [
+        f"labels {' / '.join(labels)}" if labels else "",
+        description.group(1) if description else "",
+    ]))
+
+    return [["command", record["name"], record["line"], _shorten(detail or record["signature"]), True] for record in parse_java(text)]
+
+
+def digest_file(path, text):
+    if path.endswith(".rs"):
+        return digest_rule_file(text)
+
+    if path.endswith((".yml", ".yaml")):
+        return digest_yaml_file(text)
+
+    if path.endswith(".json"):
+        return digest_json_file(text)
+
+    if path.endswith(".java"):
+        return digest_command_file(text)
+
+    return []
+
+
+def is_default_resource(path, main_dir, globs, command_dirs):
+    """Whether `path` matches a `default_resources_globs` pattern (with `*` kept
+    within one directory, like glob) or is a Java file directly in a command dir."""
+
+    for pattern in globs:
+        full = os.path.join(main_dir, pattern)
+
+        if fnmatch.fnmatch(path, full) and path.count("/") == full.count("/"):
+            return True
+
+    return path.endswith(".java") and os.path.dirname(path) in {os.path.join(main_dir, d) for d in command_dirs}
+
+
+class DefaultsIndex:
+    """Per-file digest of a project's shipped defaults: rule and group names of
+    `.rs` files, key paths of YAML and JSON resources, and command classes with
+    their labels. Rows are [kind, name, line, detail, active]. Saved digests are
+    reused across runs, so bump DEFAULTS_INDEX_VERSION whenever the rows that
+    digest_file() or java_index produce change."""
+
+    def __init__(self, files=None):
+        self.files = files or {}
+
+    @classmethod
+    def build(cls, paths, read_text):
+        return cls({path: digest_file(path, read_text(path)) for path in paths})
+
+    def update(self, path, text):
+        if text is None:
+            self.files.pop(path, None)
+        else:
+            self.files[path] = digest_file(path, text)
+
+    def summary(self, path):
+        counts = {}
+
+        for kind, _, _, _, active in self.files.get(path, []):
+            total, enabled = counts.get(kind, (0, 0))
+            counts[kind]   = (total + 1, enabled + int(active))
+
+        parts = []
+
+        for kind, (total, enabled) in sorted(counts.items()):
+            parts.append(f"{total} {kind}(s)" + (f", {total - enabled} commented out" if enabled < total else ""))
+
+        return "; ".join(parts) or "nothing recognized"
+
+    def search(self, query, kind=None):
+        """Rows matching `query` (case-insensitive) in their name, detail or file
+        path, as (path, row) pairs in path and line order."""
+
+        query = query.strip().lower()
+        found = []
+
+        for path in sorted(self.files):
+            path_match = query in path.lower()
+
+            for row in self.files[path]:
+                if kind and row[0] != kind:
+                    continue
+
+                if path_match or query in row[1].lower() or query in row[3].lower():
+                    found.append((path, row))
+
+        return found
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp  = path.with_suffix(path.suffix + ".tmp")
+
+        with gzip.open(tmp, "wt") as f:
+            json.dump({"version": DEFAULTS_INDEX_VERSION, "files": self.files}, f)
+
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt") as f:
+            data = json.load(f)
+
+        if data.get("version") != DEFAULTS_INDEX_VERSION:
+            raise ValueError(f"unsupported defaults index version {data.get('version')}")
+
+        return cls(data["files"])
+
+
+def load_or_build_defaults_index(cache, file_index, main_dir, globs, command_dirs):
+    """Open the shipped-defaults digest for the current commits from an IndexCache.
+    The artifact name carries a hash of the configured globs and command dirs, so
+    a config change starts a new digest instead of reusing a mismatched one."""
+
+    def read_text(path):
+        with open(path, errors="replace") as f:
+            return f.read()
+
+    def selected(path):
+        return is_default_resource(path, main_dir, globs, command_dirs)
+
+    def build(path):
+        index = DefaultsIndex.build([p for p in file_index.paths() if selected(p)], read_text)
+        index.save(path)
+        return index
+
+    def update(index, changed, path):
+        for changed_path in changed:
+            if selected(changed_path):
+                index.update(changed_path, read_text(changed_path) if changed_path in file_index.sizes else None)
+
+        index.save(path)
+        return index
+
+    spec = json.dumps([sorted(globs), sorted(command_dirs)])
+    name = f"defaults-{hashlib.sha1(spec.encode()).hexdigest()[:12]}.json.gz"
+
+    return cache.artifact(name, DefaultsIndex.load, build, update)
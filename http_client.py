@@ -0,0 +1,326 @@
+import hashlib
+import http.client
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from pathlib import Path
+
+
+COMMIT_SHA_PATTERN = re.compile(r"[0-9a-f]{40}")
+
+IMMUTABLE = -1
+
+CHUNK_SIZE       = 64 * 1024
+MAX_IDLE_PER_KEY = 4
+MAX_REDIRECTS    = 5
+REDIRECT_CODES   = frozenset({301, 302, 303, 307, 308})
+
+
+class HttpResponse:
+    def __init__(self, url, status, headers, body, truncated):
+        self.url       = url
+        self.status    = status
+        self.headers   = headers
+        self.body      = body
+        self.truncated = truncated
+
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+
+def read_body(resp, max_bytes=None):
+    """Read a response body, decoding gzip on the fly and stopping once more than
+    `max_bytes` decoded bytes arrived. Returns (body, truncated)."""
+
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if (resp.getheader("Content-Encoding") or "").lower() == "gzip" else None
+    parts   = []
+    size    = 0
+
+    while True:
+        chunk = resp.read(CHUNK_SIZE)
+
+        if not chunk:
+            break
+
+        while chunk:
+            if decoder:
+                data  = decoder.decompress(chunk, CHUNK_SIZE)
+                chunk = decoder.unconsumed_tail
+            else:
+                data, chunk = chunk, b""
+
+            parts.append(data)
+            size += len(data)
+
+            if max_bytes is not None and size > max_bytes:
+                return b"".join(parts)[:max_bytes], True
+
+    if decoder:
+        parts.append(decoder.flush())
+
+    body = b"".join(parts)
+
+    if max_bytes is not None and len(body) > max_bytes:
+        return body[:max_bytes], True
+
+    return body, False
+
+
+class HttpPool:
+    """Keep-alive HTTP(S) connections shared by every tool, reused per scheme,
+    host and port. Requests advertise gzip, bodies are streamed up to an
+    optional size cap, and latency is recorded per host.
+
+    Failures surface as urllib.error.HTTPError / URLError, like urlopen(), so
+    callers keep their existing error handling. Requests that must go through
+    an environment proxy fall back to urllib.
+    """
+
+    def __init__(self):
+        self.idle    = {}
+        self.latency = {}
+        self.lock    = threading.Lock()
+
+    def request(self, method, url, headers=None, body=None, timeout=30, max_bytes=None):
+        headers = dict(headers or {})
+
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self.send(method, url, headers, body, timeout, max_bytes)
+            location = response.headers.get("Location")
+
+            if response.status not in REDIRECT_CODES or not location:
+                break
+
+            target = urllib.parse.urljoin(url, location)
+
+            if urllib.parse.urlsplit(target).netloc != urllib.parse.urlsplit(url).netloc:
+                headers.pop("Authorization", None)
+
+            if response.status in (301, 302, 303) and method not in ("GET", "HEAD"):
+                method, body = "GET", None
+
+            url = target
+
+        if response.status >= 300:
+            raise urllib.error.HTTPError(url, response.status, http.client.responses.get(response.status, ""), response.headers, io.BytesIO(response.body))
+
+        return response
+
+    def send(self, method, url, headers, body, timeout, max_bytes):
+        parts = urllib.parse.urlsplit(url)
+        host  = parts.hostname or ""
+
+        if urllib.request.getproxies().get(parts.scheme) and not urllib.request.proxy_bypass(host):
+            return self.send_via_urllib(method, url, headers, body, timeout, max_bytes)
+
+        key  = (parts.scheme, host, parts.port)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+
+        request_headers = {"Accept-Encoding": "gzip", **headers}
+        started         = time.perf_counter()
+
+        for attempt in range(2):
+            conn, reused = self.checkout(key, timeout)
+
+            try:
+                conn.request(method, path, body=body, headers=request_headers)
+                resp = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+
+                if reused and attempt == 0:
+                    continue
+
+                raise urllib.error.URLError(e)
+            except TimeoutError:
+                conn.close()
+                raise
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise urllib.error.URLError(e)
+
+        try:
+            data, truncated = read_body(resp, max_bytes)
+        except BaseException:
+            conn.close()
+            raise
+
+        if truncated or resp.will_close:
+            conn.close()
+        else:
+            self.checkin(key, conn)
+
+        self.record(host, time.perf_counter() - started, reused)
+
+        return HttpResponse(url, resp.status, resp.headers, data, truncated)
+
+    def send_via_urllib(self, method, url, headers, body, timeout, max_bytes):
+        request = urllib.request.Request(url, data=body, headers={"Accept-Encoding": "gzip", **headers}, method=method)
+        started = time.perf_counter()
+
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            data, truncated = read_body(resp, max_bytes)
+
+        self.record(urllib.parse.urlsplit(url).hostname or "", time.perf_counter() - started, False)
+
+        return HttpResponse(resp.url, resp.status, resp.headers, data, truncated)
+
+    def checkout(self, key, timeout):
+        with self.lock:
+            idle = self.idle.get(key)
+            conn = idle.pop() if idle else None
+
+        if conn:
+            conn.timeout = timeout
+
+            if conn.sock:
+                conn.sock.settimeout(timeout)
+
+            return conn, True
+
+        scheme, host, port = key
+        factory            = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+
+        return factory(host, port, timeout=timeout), False
+
+    def checkin(self, key, conn):
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+
+            if len(idle) < MAX_IDLE_PER_KEY:
+                idle.append(conn)
+                return
+
+        conn.close()
+
+    def record(self, host, seconds, reused):
+        with self.lock:
+            stats = self.latency.setdefault(host, {"requests": 0, "reused": 0, "total": 0.0, "max": 0.0})
+
+            stats["requests"] += 1
+            stats["reused"]   += int(reused)
+            stats["total"]    += seconds
+            stats["max"]       = max(stats["max"], seconds)
+
+    def summary(self):
+        with self.lock:
+            return ", ".join(
+                f"{host} {stats['requests']} request(s), {stats['reused']} reused, "
+                f"avg {stats['total'] / stats['requests'] * 1000:.0f} ms, max {stats['max'] * 1000:.0f} ms"
+                for host, stats in sorted(self.latency.items())
+            )
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class HttpCache:
+    """Conditional-request cache for GET responses, one JSON file per URL.
+
+    A response younger than its TTL is served without touching the network.
+    Older ones are revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged resource costs a 304 instead of a full response (and, on the
+    GitHub API, no rate limit). Immutable entries never expire.
+    """
+
+    def __init__(self, cache_dir, pool):
+        self.cache_dir = Path(cache_dir)
+        self.pool      = pool
+        self.lock      = threading.Lock()
+        self.counts    = {"fresh": 0, "revalidated": 0, "fetched": 0}
+
+    def entry_path(self, url):
+        return self.cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+    def load(self, url):
+        try:
+            entry = json.loads(self.entry_path(url).read_text())
+        except (OSError, ValueError):
+            return None
+
+        return entry if entry.get("url") == url else None
+
+    def store(self, url, entry):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            json.dump(entry, f)
+
+        os.replace(f.name, self.entry_path(url))
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def summary(self):
+        with self.lock:
+            return ", ".join(f"{count} {outcome}" for outcome, count in self.counts.items())
+
+    def get(self, url, headers, ttl, timeout):
+        """Return the body of a GET request as text, from cache when allowed.
+
+        `ttl` is the number of seconds a stored response is served without
+        revalidation, or IMMUTABLE. Errors propagate as urllib.error.HTTPError.
+        """
+
+        entry = self.load(url)
+        now   = time.time()
+
+        if entry and (entry["ttl"] == IMMUTABLE or now - entry["stored_at"] < entry["ttl"]):
+            self.count("fresh")
+            return entry["body"]
+
+        request_headers = dict(headers)
+
+        if entry and entry.get("etag"):
+            request_headers["If-None-Match"] = entry["etag"]
+
+        if entry and entry.get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            resp          = self.pool.request("GET", url, request_headers, timeout=timeout)
+            body          = resp.text()
+            etag          = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+        except urllib.error.HTTPError as e:
+            if e.code != 304 or not entry:
+                raise
+
+            entry["stored_at"] = now
+            entry["ttl"]       = ttl
+            self.store(url, entry)
+            self.count("revalidated")
+
+            return entry["body"]
+
+        self.store(url, {
+            "url":           url,
+            "etag":          etag,
+            "last_modified": last_modified,
+            "stored_at":     now,
+            "ttl":           ttl,
+            "body":          body,
+        })
+
+        self.count("fetched")
+
+        return body
+
+
+def is_commit_sha(ref):
+    return bool(COMMIT_SHA_PATTERN.fullmatch(ref.lower()))
@@ -0,0 +1,691 @@
+import gzip
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>/\*.*?\*/|//[^\n]*)
+  | (?P<string>\"\"\".*?\"\"\"|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<punct>[{}();,=@<>?\[\].:])
+  | (?P<newline>\n)
+""", re.S | re.X)
+
+TYPE_KEYWORDS = frozenset({"class", "interface", "enum", "record"})
+MODIFIERS     = frozenset({"public", "protected", "private", "static", "final", "abstract", "synchronized", "native", "transient", "volatile", "default", "strictfp", "sealed", "non-sealed"})
+
+CONFIG_KEY_PATTERN = re.compile(r"[A-Z][A-Za-z0-9_-]*(?:\.[A-Za-z0-9_-]+)+")
+YAML_KEY_PATTERN   = re.compile(r"""^( *)(?:'([^']+)'|"([^"]+)"|([^\s#'"\-][^:#]*?)):(?:\s|$)""")
+YAML_EXTENSIONS    = (".yml", ".yaml")
+
+SYMBOL_INDEX_VERSION = 1
+
+MEMBER_LABELS = {
+    "constant":    "const",
+    "field":       "field",
+    "constructor": "ctor",
+    "method":      "method",
+    "initializer": "init",
+}
+
+
+def tokenize_java(source):
+    """Yield (kind, value, line) tokens of Java source. Whitespace and number
+    literals are skipped; comments and string literals are kept whole."""
+
+    line = 1
+
+    for match in TOKEN_PATTERN.finditer(source):
+        kind  = match.lastgroup
+        value = match.group()
+
+        if kind == "newline":
+            line += 1
+            continue
+
+        yield kind, value, line
+
+        if kind in ("comment", "string"):
+            line += value.count("\n")
+
+
+def _strip_annotations(segment):
+    """Drop `@Annotation` and `@Annotation(...)` tokens, keeping `@interface`."""
+
+    stripped = []
+    i        = 0
+
+    while i < len(segment):
+        token = segment[i]
+
+        if token[1] != "@" or i + 1 >= len(segment) or segment[i + 1][1] == "interface":
+            stripped.append(token)
+            i += 1
+            continue
+
+        i += 2
+
+        while i + 1 < len(segment) and segment[i][1] == "." and segment[i + 1][0] == "ident":
+            i += 2
+
+        if i < len(segment) and segment[i][1] == "(":
+            depth = 0
+
+            while i < len(segment):
+                depth += {"(": 1, ")": -1}.get(segment[i][1], 0)
+                i     += 1
+
+                if depth == 0:
+                    break
+
+    return stripped
+
+
+def _join_tokens(segment):
+    """Render declaration tokens as one line of Java, e.g. `public <R> R map(Function<T, R> fn)`."""
+
+    parts    = []
+    previous = None
+
+    for kind, value, _ in segment:
+        glued = previous is not None and (
+            value in "().,[]>"
+            or previous in "(.[<@"
+            or (value == "<" and previous not in MODIFIERS and previous[0].isalnum())
+        )
+
+        parts.append(value if glued or previous is None else " " + value)
+        previous = value
+
+    return "".join(parts)
+
+
+def _top_level_index(segment, value):
+    depth = 0
+
+    for i, token in enumerate(segment):
+        if token[1] == value and depth == 0:
+            return i
+
+        if token[1] == "(":
+            depth += 1
+        elif token[1] == ")":
+            depth -= 1
+
+    return -1
+
+
+def _declarator_names(segment):
+    """Names declared by a field statement such as `int a = 1, b;`."""
+
+    names  = []
+    last   = None
+    parens = 0
+    angles = 0
+    in_init = False
+
+    for kind, value, _ in segment:
+        if value in "([{":
+            parens += 1
+        elif value in ")]}":
+            parens -= 1
+        elif value == "<" and not in_init:
+            angles += 1
+        elif value == ">" and not in_init:
+            angles -= 1
+        elif value == "=" and parens == 0 and angles == 0:
+            if last and not in_init:
+                names.append(last)
+
+            in_init = True
+        elif value == "," and parens == 0 and angles == 0:
+            if last and not in_init:
+                names.append(last)
+
+            in_init = False
+            last    = None
+        elif kind == "ident" and not in_init:
+            last = value
+
+    if last and not in_init:
+        names.append(last)
+
+    return names
+
+
+def _classify(segment, type_name):
+    """Classify the declaration tokens before a `{` or `;` at member level.
+    Returns (kind, name, signature tokens) or None."""
+
+    segment = _strip_annotations(segment)
+    values  = [token[1] for token in segment]
+
+    if not segment or all(value in MODIFIERS for value in values):
+        return ("initializer", "static" if "static" in values else "{}", segment)
+
+    if _top_level_index(segment, "=") != -1:
+        return ("field", None, segment[:_top_level_index(segment, "=")])
+
+    for i, value in enumerate(values):
+        if value in TYPE_KEYWORDS and i + 1 < len(segment) and segment[i + 1][0] == "ident" and (i == 0 or values[i - 1] != "."):
+            kind = "@interface" if value == "interface" and i > 0 and values[i - 1] == "@" else value
+            return (kind, segment[i + 1][1], segment)
+
+    paren = _top_level_index(segment, "(")
+
+    if paren > 0 and segment[paren - 1][0] == "ident":
+        name = segment[paren - 1][1]
+        kind = "constructor" if name == type_name else "method"
+
+        return (kind, name, segment)
+
+    return ("field", None, segment)
+
+
+def _new_member(kind, name, signature, line, start):
+    return {"kind": kind, "name": name, "signature": signature, "line": line, "start": start, "end": line}
+
+
+def parse_java(source):
+    """Lightweight structural parse of one Java file.
+
+    Returns a list of type dicts (kind, name, qualified name, line/start/end,
+    header signature and members). Members are fields, enum constants,
+    constructors, methods and initializers, each with the line of its name,
+    its first line including Javadoc and annotations, and its last line.
+    Method bodies are skipped by brace depth, so malformed code degrades to a
+    partial outline instead of an error.
+    """
+
+    types    = []
+    stack    = []
+    skips    = []
+    segment  = []
+    depth    = 0
+    doc_line = None
+
+    def owner():
+        return stack[-1] if stack and depth == stack[-1]["body_depth"] else None
+
+    def declaration_start():
+        first = segment[0][2] if segment else None
+        return min(line for line in (doc_line, first) if line) if (doc_line or first) else None
+
+    def add_fields(segment_tokens, end_line):
+        target   = owner()
+        stripped = _strip_annotations(segment_tokens)
+        names    = _declarator_names(stripped)
+        start    = declaration_start()
+
+        if not names:
+            return
+
+        prefix = stripped[:next(i for i, token in enumerate(stripped) if token[1] == names[0])]
+
+        for name in names:
+            name_token    = next((token for token in stripped if token[1] == name), None)
+            member        = _new_member("field", name, _join_tokens(prefix + [name_token]), name_token[2], start)
+            member["end"] = end_line
+
+            target["members"].append(member)
+
+    def add_constant(segment_tokens, end_line):
+        target = owner()
+        stripped = _strip_annotations(segment_tokens)
+
+        if stripped and stripped[0][0] == "ident":
+            member        = _new_member("constant", stripped[0][1], _join_tokens(stripped), stripped[0][2], declaration_start())
+            member["end"] = end_line
+
+            target["members"].append(member)
+
+            return member
+
+    for kind, value, line in tokenize_java(source):
+        if kind == "comment":
+            if value.startswith("/**") and not segment:
+                doc_line = line
+
+            continue
+
+        if skips:
+            if value == "{":
+                depth += 1
+            elif value == "}":
+                depth -= 1
+
+                if depth == skips[-1][1]:
+                    member = skips.pop()[0]
+
+                    if member:
+                        member["end"] = line
+
+            continue
+
+        if value == "{":
+            target = owner()
+
+            if target is not None and target["in_constants"]:
+                member = add_constant(segment, line)
+                skips.append((member, depth))
+                segment, doc_line = [], None
+                depth += 1
+                continue
+
+            if target is not None or (not stack and depth == 0):
+                declaration = _classify(segment, target["name"] if target else "")
+
+                if declaration and declaration[0] in TYPE_KEYWORDS | {"@interface"}:
+                    type_kind, name, tokens = declaration
+                    name_line = next((token[2] for token in tokens if token[1] == name), line)
+                    parent    = stack[-1]["qualified"] if stack else ""
+
+                    record = {
+                        "kind":         type_kind,
+                        "name":         name,
+                        "qualified":    f"{parent}.{name}" if parent else name,
+                        "signature":    _join_tokens(tokens),
+                        "line":         name_line,
+                        "start":        declaration_start() or name_line,
+                        "end":          line,
+                        "members":      [],
+                        "body_depth":   depth + 1,
+                        "in_constants": type_kind == "enum",
+                    }
+
+                    types.append(record)
+                    stack.append(record)
+
+                    if target is not None:
+                        member = _new_member(type_kind, name, _join_tokens(tokens), name_line, record["start"])
+                        target["members"].append(member)
+                        record["member"] = member
+                elif target is not None and declaration and declaration[0] == "field":
+                    segment.append((kind, value, line))
+                    skips.append((None, depth))
+                    depth += 1
+                    continue
+                elif target is not None and declaration:
+                    member_kind, name, tokens = declaration
+                    name_line = next((token[2] for token in tokens if token[1] == name), line) if name else line
+                    member    = _new_member(member_kind, name, _join_tokens(tokens), name_line, declaration_start() or line)
+
+                    target["members"].append(member)
+                    skips.append((member, depth))
+
+                segment, doc_line = [], None
+
+            depth += 1
+            continue
+
+        if value == "}":
+            target = owner()
+
+            if target is not None and target["in_constants"] and segment:
+                add_constant(segment, line)
+
+            depth -= 1
+
+            if stack and depth == stack[-1]["body_depth"] - 1:
+                record        = stack.pop()
+                record["end"] = line
+
+                if "member" in record:
+                    record.pop("member")["end"] = line
+
+            segment, doc_line = [], None
+            continue
+
+        target = owner()
+
+        if target is None:
+            if not stack and depth == 0:
+                if value == ";":
+                    segment, doc_line = [], None
+                else:
+                    segment.append((kind, value, line))
+
+            continue
+
+        if target["in_constants"] and value in (",", ";"):
+            if segment:
+                add_constant(segment, line)
+
+            if value == ";":
+                target["in_constants"] = False
+
+            segment, doc_line = [], None
+            continue
+
+        if value == ";":
+            declaration = _classify(segment, target["name"]) if segment else None
+
+            if declaration and declaration[0] in ("method", "constructor"):
+                member_kind, name, tokens = declaration
+                name_line = next((token[2] for token in tokens if token[1] == name), line)
+                member    = _new_member(member_kind, name, _join_tokens(tokens), name_line, declaration_start() or line)
+
+                member["end"] = line
+                target["members"].append(member)
+            elif segment:
+                add_fields(segment, line)
+
+            segment, doc_line = [], None
+            continue
+
+        segment.append((kind, value, line))
+
+    for record in types:
+        record.pop("body_depth", None)
+        record.pop("in_constants", None)
+        record.pop("member", None)
+
+    return types
+
+
+def format_outline(path, types, line_count):
+    lines = [f"{path} ({line_count:,} lines)"]
+
+    for record in types:
+        indent = "  " * record["qualified"].count(".")
+        lines.append(f"{indent}L{record['line']}-{record['end']}  {record['signature']}")
+
+        for member in record["members"]:
+            if member["kind"] in TYPE_KEYWORDS or member["kind"] == "@interface":
+                continue
+
+            span  = f"L{member['line']}" if member["end"] == member["line"] else f"L{member['line']}-{member['end']}"
+            label = MEMBER_LABELS.get(member["kind"], member["kind"])
+            text  = member["signature"] if member["kind"] != "initializer" else f"{member['name']} initializer"
+
+            lines.append(f"{indent}  {span:<12} {label:<6} {text}")
+
+    return "\n".join(lines)
+
+
+def find_members(types, name):
+    """Members matching `name`, `Type.name` or `Outer.Inner.name`, in file order.
+    A bare top-level type name only matches the whole type when no member
+    (such as its constructor) has that name."""
+
+    type_name, _, member_name = name.rpartition(".")
+    found = []
+
+    for record in types:
+        if type_name and record["qualified"] != type_name and not record["qualified"].endswith("." + type_name):
+            continue
+
+        for member in record["members"]:
+            if member["name"] == member_name:
+                found.append((record, member))
+
+    if not found and not type_name:
+        found = [(record, record) for record in types if record["qualified"] == member_name]
+
+    return found
+
+
+class OutlineCache:
+    """Parsed outlines per file, valid while the file's mtime and size match."""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock    = threading.Lock()
+
+    def get(self, resolved):
+        stat  = resolved.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.entries.get(resolved)
+
+            if entry and entry[0] == stamp:
+                return entry[1], entry[2]
+
+        source = resolved.read_text(errors="replace")
+        types  = parse_java(source)
+        count  = source.count("\n") + (0 if source.endswith("\n") else 1)
+
+        with self.lock:
+            self.entries[resolved] = (stamp, types, count)
+
+        return types, count
+
+    def invalidate(self, resolved):
+        with self.lock:
+            self.entries.pop(resolved, None)
+
+
+def yaml_key_lines(text):
+    """Yield (dotted.key.path, line) for every mapping key of a YAML file,
+    following indentation. Flow mappings and multi-line scalars are ignored."""
+
+    stack = []
+
+    for number, line in enumerate(text.splitlines(), 1):
+        match = YAML_KEY_PATTERN.match(line)
+
+        if not match:
+            continue
+
+        indent = len(match.group(1))
+        key    = next(group for group in match.groups()[1:] if group is not None).strip()
+
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+
+        stack.append((indent, key))
+
+        yield ".".join(part for _, part in stack), number
+
+
+def java_definitions(source):
+    """Definitions of one Java file as [name, line, kind, qualified, signature] rows."""
+
+    rows = []
+
+    for record in parse_java(source):
+        rows.append([record["name"], record["line"], record["kind"], record["qualified"], record["signature"]])
+
+        for member in record["members"]:
+            if member["kind"] in TYPE_KEYWORDS or member["kind"] in ("@interface", "initializer"):
+                continue
+
+            rows.append([member["name"], member["line"], member["kind"], f"{record['qualified']}.{member['name']}", member["signature"]])
+
+    return rows
+
+
+def java_references(source, names, definition_lines):
+    """(name, line) pairs for identifiers in `names` and config-key-like string
+    literals, skipping the definition sites themselves."""
+
+    found = set()
+
+    for kind, value, line in tokenize_java(source):
+        if kind == "ident":
+            if value in names and (value, line) not in definition_lines:
+                found.add((value, line))
+        elif kind == "string" and value.startswith('"') and not value.startswith('"""'):
+            literal = value[1:-1]
+
+            if CONFIG_KEY_PATTERN.fullmatch(literal):
+                found.add((literal, line))
+
+    return found
+
+
+class SymbolIndex:
+    """Definitions and references of Java types, members and config keys.
+
+    Definitions come from the Java outline parser and from the key paths of
+    YAML resources. References are name based: every identifier token that
+    matches a defined name, plus string literals shaped like config keys
+    (`Channels.Sync.Enabled`). Overloads and same-named members of different
+    types are therefore not told apart.
+    """
+
+    def __init__(self, definitions=None, references=None):
+        self.definitions = definitions or {}
+        self.references  = references or {}
+        self.lock        = threading.Lock()
+
+    @classmethod
+    def build(cls, paths, read_text):
+        index      = cls()
+        java_paths = []
+        per_file   = {}
+
+        for path in paths:
+            if path.endswith(".java"):
+                java_paths.append(path)
+                per_file[path] = java_definitions(read_text(path))
+            elif path.endswith(YAML_EXTENSIONS):
+                per_file[path] = [[key, line, "config", key, ""] for key, line in yaml_key_lines(read_text(path))]
+
+        for path, rows in per_file.items():
+            for row in rows:
+                index.definitions.setdefault(row[0], []).append([path] + row[1:])
+
+        for path in java_paths:
+            index._add_references(path, read_text(path), per_file[path])
+
+        return index
+
+    def _add_references(self, path, source, definitions):
+        definition_lines = {(row[0], row[1]) for row in definitions}
+
+        for name, line in sorted(java_references(source, self.definitions, definition_lines)):
+            self.references.setdefault(name, {}).setdefault(path, []).append(line)
+
+    def update(self, path, source):
+        """Re-index one file after it changed, or drop it when `source` is None."""
+
+        self.update_many({path: source})
+
+    def update_many(self, sources):
+        """Re-index changed files in one pass over the index, given {path: source}
+        with None for deleted files. References to names a file newly defines
+        are only found in files re-indexed at the same time or later."""
+
+        with self.lock:
+            for name in list(self.definitions):
+                kept = [row for row in self.definitions[name] if row[0] not in sources]
+
+                if kept:
+                    self.definitions[name] = kept
+                else:
+                    del self.definitions[name]
+
+            for name in list(self.references):
+                files = self.references[name]
+
+                for path in sources:
+                    files.pop(path, None)
+
+                if not files:
+                    del self.references[name]
+
+            per_file = {}
+
+            for path, source in sources.items():
+                if source is None:
+                    continue
+
+                if path.endswith(".java"):
+                    per_file[path] = java_definitions(source)
+                elif path.endswith(YAML_EXTENSIONS):
+                    per_file[path] = [[key, line, "config", key, ""] for key, line in yaml_key_lines(source)]
+
+            for path, rows in per_file.items():
+                for row in rows:
+                    self.definitions.setdefault(row[0], []).append([path] + row[1:])
+
+            for path, rows in per_file.items():
+                if path.endswith(".java"):
+                    self._add_references(path, sources[path], rows)
+
+    def find_definitions(self, query):
+        """Rows of [path, line, kind, qualified, signature] for a simple name,
+        a `Type.member` / package-qualified name, or a config key."""
+
+        query = query.strip()
+
+        with self.lock:
+            if query in self.definitions:
+                return [row for row in self.definitions[query] if row[2] != "config" or row[3] == query]
+
+            name  = query.rpartition(".")[2]
+            found = [row for row in self.definitions.get(name, []) if row[3] == query or row[3].endswith("." + query) or query.endswith("." + row[3])]
+
+            if not found and CONFIG_KEY_PATTERN.fullmatch(query):
+                found = [row for key, rows in self.definitions.items() if key.endswith("." + query) for row in rows if row[2] == "config"]
+
+            return found
+
+    def find_references(self, query):
+        """{path: [lines]} for a name. `Type.member` narrows member references to
+        files that define or mention `Type`."""
+
+        query = query.strip()
+
+        with self.lock:
+            if query in self.references or CONFIG_KEY_PATTERN.fullmatch(query) and query in self.definitions:
+                return {path: list(lines) for path, lines in self.references.get(query, {}).items()}
+
+            owner, _, name = query.rpartition(".")
+            files          = self.references.get(name, {})
+
+            if not owner:
+                return {path: list(lines) for path, lines in files.items()}
+
+            owner_name = owner.rpartition(".")[2]
+            related    = set(self.references.get(owner_name, {})) | {row[0] for row in self.definitions.get(owner_name, [])}
+
+            return {path: list(lines) for path, lines in files.items() if path in related}
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp  = path.with_suffix(path.suffix + ".tmp")
+
+        with gzip.open(tmp, "wt") as f:
+            json.dump({"version": SYMBOL_INDEX_VERSION, "definitions": self.definitions, "references": self.references}, f)
+
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt") as f:
+            data = json.load(f)
+
+        if data.get("version") != SYMBOL_INDEX_VERSION:
+            raise ValueError(f"unsupported symbol index version {data.get('version')}")
+
+        return cls(data["definitions"], data["references"])
+
+
+def load_or_build_symbol_index(cache, file_index):
+    """Open the symbol index for the current commits from an IndexCache,
+    building it on first use or re-indexing only the files changed since the
+    cached commits."""
+
+    def read_text(relative):
+        with open(relative, errors="replace") as f:
+            return f.read()
+
+    def build(path):
+        index = SymbolIndex.build(file_index.paths((".java",) + YAML_EXTENSIONS), read_text)
+        index.save(path)
+        return index
+
+    def update(index, changed, path):
+        index.update_many({p: read_text(p) if p in file_index.sizes else None for p in changed if p.endswith((".java",) + YAML_EXTENSIONS)})
+        index.save(path)
+        return index
+
+    return cache.artifact("symbols.json.gz", SymbolIndex.load, build, update)
@@ -0,0 +1,95 @@
+CHARS_PER_TOKEN = 4
+
+REQUIRED   = "required"
+KEEP_START = "keep_start"
+KEEP_END   = "keep_end"
+KEEP_ENDS  = "keep_ends"
+KEEP_LINES = "keep_lines"
+
+
+def estimate_tokens(text):
+    """Rough token count for English prose and source code, without a tokenizer."""
+
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncation_marker(omitted):
+    return f"... ({omitted:,} characters omitted to fit the prompt budget)"
+
+
+def truncate_text(text, max_chars, strategy):
+    """Cut `text` to at most about `max_chars`, keeping the part `strategy` names
+    and saying how much was left out."""
+
+    if len(text) <= max_chars:
+        return text
+
+    marker_length = len(truncation_marker(len(text))) + 2
+    keep          = max(max_chars - marker_length, 0)
+    omitted       = len(text) - keep
+
+    if strategy == KEEP_END:
+        return f"{truncation_marker(omitted)}\n\n{text[len(text) - keep:]}"
+
+    if strategy == KEEP_ENDS:
+        head = keep // 3
+        tail = keep - head
+        return f"{text[:head]}\n\n{truncation_marker(omitted)}\n\n{text[len(text) - tail:]}"
+
+    if strategy == KEEP_LINES:
+        cut = text.rfind("\n", 0, keep + 1)
+        cut = cut if cut > 0 else keep
+        return f"{text[:cut]}\n{truncation_marker(len(text) - cut)}"
+
+    return f"{text[:keep]}\n\n{truncation_marker(omitted)}"
+
+
+class PromptSection:
+    """One variable part of a prompt. When a prompt runs over budget, sections
+    with the lowest priority are cut first, each by its own strategy; REQUIRED
+    sections are never cut."""
+
+    def __init__(self, name, text, priority=0, strategy=KEEP_START):
+        self.name     = name
+        self.text     = text or ""
+        self.priority = priority
+        self.strategy = strategy
+        self.fitted   = self.text
+
+
+def fit_prompt(render, sections, budget_tokens):
+    """Render a prompt from `sections` within `budget_tokens`.
+
+    `render` takes {name: text} and returns the full prompt, so the fixed
+    template around the sections is measured by rendering it with every
+    section empty. Returns the prompt and a one-line size breakdown.
+    """
+
+    fixed_tokens = estimate_tokens(render({s.name: "" for s in sections}))
+    excess       = fixed_tokens + sum(estimate_tokens(s.text) for s in sections) - budget_tokens
+
+    for section in sorted(sections, key=lambda s: s.priority):
+        section.fitted = section.text
+
+        if excess <= 0 or section.strategy == REQUIRED or not section.text:
+            continue
+
+        before         = estimate_tokens(section.text)
+        section.fitted = truncate_text(section.text, max(before - excess, 0) * CHARS_PER_TOKEN, section.strategy)
+        excess        -= before - estimate_tokens(section.fitted)
+
+    prompt = render({s.name: s.fitted for s in sections})
+    parts  = [f"fixed {fixed_tokens:,}"]
+
+    for section in sections:
+        fitted = estimate_tokens(section.fitted)
+        before = estimate_tokens(section.text)
+        parts.append(f"{section.name} {fitted:,}" + (f" (cut from {before:,})" if fitted < before else ""))
+
+    total     = estimate_tokens(prompt)
+    breakdown = f"~{total:,} / {budget_tokens:,} tokens — " + ", ".join(parts)
+
+    if total > budget_tokens:
+        breakdown += " — over budget, only required text is left"
+
+    return prompt, breakdown
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from copilot.tools import Tool, ToolInvocation
+
+import responder
+from bench_preanalysis import commit_tree, generate_tree
+from code_index import repo_head_sha
+from telemetry import RunReport, read_recording
+
+
+SYNTHETIC_SEED = 1
+
+SIDE_EFFECT_TOOLS = frozenset({
+    "write_codebase_file", "patch_codebase_file", "batch_patch_codebase_files",
+    "store_insight", "write_working_note", "close_pull_request",
+})
+
+DEFAULT_REPLIES = {
+    "triage": "YES",
+    "intent": "ANSWER_ONLY",
+    "research": "- No findings recorded for this replay.",
+    "summary": "- No summary recorded for this replay.",
+    "study": {
+        "tools": [
+            {"name": "list_directory", "arguments": {"path": responder.MAIN_DIR}},
+            {"name": "list_directory", "arguments": {"path": responder.FOUNDATION_DIR}},
+            {"name": "query_shipped_defaults", "arguments": {}},
+            {"name": "read_working_notes", "arguments": {}},
+        ],
+        "text": (
+            "1. Skill files read\n- none\n\n"
+            "2. Searches and directories checked\n- main/ and foundation/ listed, shipped defaults queried\n\n"
+            "3. Source files read\n- none\n\n"
+            "4. Verified facts\n- No study was recorded for this replay, so nothing beyond the directory listings was verified.\n\n"
+            "5. Inactive or commented out findings\n- none\n\n"
+            "6. Unsafe claims to avoid\n- none\n\n"
+            "7. Recommended answer facts\n- none"
+        ),
+    },
+    "response": f"<{responder.PUBLIC_RESPONSE_TAG}>Replayed response.</{responder.PUBLIC_RESPONSE_TAG}>",
+}
+
+
+def as_reply(reply):
+    return {"text": reply} if isinstance(reply, str) else reply
+
+
+def session_kind(system_prompt, prompt):
+    """Which pipeline step a session belongs to, from its system prompt or its
+    first prompt. Transcripts list their replies under these names."""
+
+    if "triage classifier" in system_prompt:
+        return "triage" if "YES or NO" in system_prompt else "intent"
+
+    if "You are a research agent" in system_prompt:
+        return "research"
+
+    if "You summarize GitHub issue threads" in system_prompt:
+        return "summary"
+
+    if prompt.startswith("Study the codebase"):
+        return "study"
+
+    return "response"
+
+
+def event(etype, **data):
+    return SimpleNamespace(type=SimpleNamespace(value=etype), data=SimpleNamespace(**data))
+
+
+class ReplaySession:
+    """Stand-in for a Copilot session that answers each prompt with the next
+    recorded reply of its kind. The reply's tool calls run through the real
+    tool handlers, with the same events the SDK emits, so everything except
+    the model is exercised."""
+
+    def __init__(self, client, session_id, system_prompt, tools):
+        self.client        = client
+        self.session_id    = session_id
+        self.system_prompt = system_prompt
+        self.tools         = {tool.name: tool for tool in tools}
+        self.kind          = None
+        self.handlers      = []
+        self.events        = []
+
+    def on(self, handler):
+        self.handlers.append(handler)
+        return lambda: self.handlers.remove(handler)
+
+    def emit(self, item):
+        self.events.append(item)
+
+        for handler in list(self.handlers):
+            handler(item)
+
+    async def send(self, prompt, mode=None):
+        self.client.queued += 1
+
+    async def send_and_wait(self, prompt, timeout=None):
+        if self.kind is None:
+            self.kind = session_kind(self.system_prompt, prompt)
+
+        reply = self.client.next_reply(self.kind)
+
+        self.emit(event("assistant.turn_start"))
+
+        for call in reply.get("tools", []):
+            await self.run_tool(call["name"], call.get("arguments") or {})
+
+        if reply.get("delay"):
+            await asyncio.sleep(reply["delay"])
+
+        self.emit(event("assistant.usage", input_tokens=reply.get("input_tokens"), output_tokens=reply.get("output_tokens"), cache_read_tokens=None))
+        self.emit(event("assistant.message", content=reply["text"]))
+
+    async def run_tool(self, name, arguments):
+        call_id = f"replay-{next(self.client.call_ids)}"
+        tool    = self.tools.get(name)
+
+        self.emit(event("tool.execution_start", tool_call_id=call_id, tool_name=name, arguments=arguments))
+
+        if tool is None:
+            print(f"  Replay \u2014 {self.kind} session has no tool {name}, skipping the call")
+            self.emit(event("tool.execution_complete", tool_call_id=call_id, success=False))
+            return
+
+        result = await tool.handler(ToolInvocation(session_id=self.session_id, tool_call_id=call_id, tool_name=name, arguments=arguments))
+
+        self.emit(event("tool.execution_complete", tool_call_id=call_id, success=result.result_type != "failure", result=SimpleNamespace(content=result.text_result_for_llm)))
+
+    async def get_events(self):
+        return list(self.events)
+
+    async def disconnect(self):
+        pass
+
+
+class ReplayClient:
+    """Stand-in for CopilotClient. Replies are consumed per session kind in
+    order, across all sessions of that kind (a Phase 2 retry session continues
+    with the next `response` reply); a kind without replies left gets its
+    DEFAULT_REPLIES entry."""
+
+    def __init__(self, transcript):
+        self.replies  = {kind: list(replies) for kind, replies in transcript.get("sessions", {}).items()}
+        self.ids      = itertools.count(1)
+        self.call_ids = itertools.count(1)
+        self.sessions = 0
+        self.queued   = 0
+
+    def __call__(self, **kwargs):
+        return self
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def create_session(self, **kwargs):
+        self.sessions += 1
+        return ReplaySession(self, f"replay-session-{next(self.ids)}", kwargs["system_message"]["content"], kwargs.get("tools", []))
+
+    def next_reply(self, kind):
+        pending = self.replies.get(kind)
+
+        if pending:
+            return as_reply(pending.pop(0))
+
+        return as_reply(DEFAULT_REPLIES[kind])
+
+
+def load_transcript(path):
+    with open(path) as f:
+        transcript = json.load(f)
+
+    if "event" not in transcript or "ISSUE_TITLE" not in transcript["event"]:
+        raise SystemExit(f"{path}: transcript needs an \"event\" object with at least ISSUE_TITLE")
+
+    check_study_replies(transcript)
+
+    return transcript
+
+
+def check_study_replies(transcript):
+    """Warn about study replies below the floors of run_codebase_study. A short
+    one sends the run down the failed-study path instead of the normal
+    pipeline, and too few tool calls add a nudge, which takes the next reply."""
+
+    replies = [(f"study reply {n}", reply) for n, reply in enumerate(transcript.get("sessions", {}).get("study", []), 1)]
+
+    for label, reply in replies + [("default study reply", DEFAULT_REPLIES["study"])]:
+        reply = as_reply(reply)
+        text  = reply["text"].strip()
+        tools = len(reply.get("tools", []))
+
+        if len(text) <= responder.STUDY_MIN_LENGTH:
+            print(f"Warning: {label} has {len(text)} chars, the study needs more than {responder.STUDY_MIN_LENGTH}, so the run continues without a study")
+
+        if tools < responder.STUDY_MIN_TOOL_CALLS:
+            print(f"Warning: {label} makes {tools} tool call(s), fewer than the study's {responder.STUDY_MIN_TOOL_CALLS}, so it is nudged and consumes the next study reply")
+
+
+async def replay_once(transcript, output_dir):
+    """Run the responder end to end against the stub client. The event goes
+    through batch mode so the response and any code changes land in
+    `output_dir` and the checkouts are left clean."""
+
+    client       = ReplayClient(transcript)
+    events_path  = output_dir / "events.jsonl"
+    event_data   = dict(transcript["event"])
+    conversation = transcript.get("conversation")
+
+    if conversation is not None:
+        conversation_path = output_dir / "conversation.json"
+        conversation_path.write_text(json.dumps(conversation))
+        event_data["CONVERSATION_FILE"] = str(conversation_path)
+
+    events_path.write_text(json.dumps(event_data) + "\n")
+
+    responder.CopilotClient = client
+    responder.run_report    = RunReport()
+
+    args    = SimpleNamespace(serve=False, batch=str(events_path), concurrency=1, output_dir=str(output_dir / "outputs"), host=None, port=0, watch_dir=None)
+    started = time.perf_counter()
+    error   = None
+
+    try:
+        await responder.run(args)
+    except RuntimeError as e:
+        error = str(e)
+
+    return {
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "sessions": client.sessions,
+        "queued_messages": client.queued,
+        "error": error,
+        "run_report": responder.run_report.to_dict(),
+    }
+
+
+def print_summary(results):
+    for number, result in enumerate(results, 1):
+        phases = ", ".join(f"{name} {stats['wall_seconds']:.2f}s" for name, stats in result["run_report"]["phases"].items())
+        print(f"Replay \u2014 run {number}: {result['wall_seconds']:.2f}s, {result['sessions']} session(s){' FAILED: ' + result['error'] if result['error'] else ''} ({phases})")
+
+    walls = [result["wall_seconds"] for result in results]
+
+    if len(walls) > 1:
+        print(f"Replay \u2014 {len(walls)} runs: first {walls[0]:.2f}s, median of the rest {statistics.median(walls[1:]):.2f}s, min {min(walls):.2f}s, max {max(walls):.2f}s")
+
+
+def registered_tools():
+    return {value.name: value for value in vars(responder).values() if isinstance(value, Tool)}
+
+
+async def replay_tools(header, events):
+    """Re-run the read-only tool calls of a session recording in their recorded
+    order against the current checkouts, one at a time, and compare each
+    duration and result size with the recording. Tools in SIDE_EFFECT_TOOLS are
+    skipped, so reads of files the session wrote can differ in size."""
+
+    tools     = registered_tools()
+    completed = {e["call"]: e for e in events if e["type"] == "tool.execution_complete"}
+    started   = {e["call"]: e for e in events if e["type"] == "tool.execution_start"}
+    per_tool  = {}
+
+    for call, start in started.items():
+        name  = start["tool"]
+        done  = completed.get(call)
+        stats = per_tool.setdefault(name, {"calls": 0, "skipped": 0, "recorded_seconds": 0.0, "replay_seconds": 0.0, "size_changed": 0})
+
+        if done is not None:
+            stats["recorded_seconds"] += done["t"] - start["t"]
+
+        if name in SIDE_EFFECT_TOOLS or name not in tools or done is None:
+            stats["skipped"] += 1
+            continue
+
+        begun  = time.perf_counter()
+        result = await tools[name].handler(ToolInvocation(session_id="replay", tool_call_id=call, tool_name=name, arguments=start.get("args") or {}))
+
+        stats["calls"]          += 1
+        stats["replay_seconds"] += time.perf_counter() - begun
+        stats["size_changed"]   += int(len((result.text_result_for_llm or "").encode()) != done.get("result_bytes"))
+
+    recorded_tools = sum(stats["recorded_seconds"] for stats in per_tool.values())
+
+    return {
+        "project": header.get("project"),
+        "issue": header.get("issue"),
+        "recorded_seconds": round(events[-1]["t"] - events[0]["t"], 3) if events else 0.0,
+        "recorded_tool_seconds": round(recorded_tools, 3),
+        "tools": per_tool,
+    }
+
+
+def print_tool_summary(result):
+    for name, stats in sorted(result["tools"].items(), key=lambda item: -item[1]["recorded_seconds"]):
+        skipped = f", {stats['skipped']} skipped" if stats["skipped"] else ""
+        changed = f", {stats['size_changed']} with a different result size" if stats["size_changed"] else ""
+        print(f"Replay \u2014 {name}: {stats['calls']} call(s){skipped}, recorded {stats['recorded_seconds']:.2f}s, replayed {stats['replay_seconds']:.2f}s{changed}")
+
+    replayed = sum(stats["replay_seconds"] for stats in result["tools"].values())
+    other    = result["recorded_seconds"] - result["recorded_tool_seconds"]
+
+    print(f"Replay \u2014 recorded session time {result['recorded_seconds']:.1f}s: {result['recorded_tool_seconds']:.1f}s in tools, {other:.1f}s in the model and the responder; the replayed tools took {replayed:.1f}s")
+
+
+def synthetic_workspace(root, files):
+    """Lay out a workspace in `root` with generated main/ and foundation/ trees
+    of about `files` files (see bench_preanalysis.generate_tree) next to a copy
+    of this directory as ai-support/, so runs never write into the real one."""
+
+    generate_tree(root, files, SYNTHETIC_SEED)
+    commit_tree(root)
+
+    ignored = shutil.ignore_patterns(".git", "__pycache__", ".index-cache", responder.WORKING_DIR)
+    shutil.copytree(Path(__file__).resolve().parent, Path(root, responder.AI_SUPPORT_DIR), ignore=ignored)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a recorded issue transcript through the responder with a stub Copilot client, or the tool calls of a session recording, and report timings.")
+    parser.add_argument("transcript", help="JSON transcript with an \"event\" (single-issue environment variables), optional \"conversation\" and per-kind \"sessions\" replies; or a sessions.jsonl.gz recording, whose tool calls are re-run on their own")
+    parser.add_argument("--workspace", default=".", help="directory holding main/, foundation/ and ai-support/, as in the workflow (default: current directory)")
+    parser.add_argument("--synthetic", type=int, metavar="FILES", help="replay against generated main/ and foundation/ trees of about FILES files in a temporary workspace instead of --workspace")
+    parser.add_argument("--repeat", type=int, default=1, help="number of transcript runs; the first one builds the indexes, later ones reuse them in-process")
+    parser.add_argument("--report", help="write the timings and run report of every run to this JSON file")
+
+    return parser.parse_args()
+
+
+def main():
+    args   = parse_args()
+    report = Path(args.report).resolve() if args.report else None
+
+    if args.transcript.endswith(".jsonl.gz"):
+        if args.synthetic:
+            raise SystemExit("--synthetic only applies to transcripts, a recording replays against the checkouts it was recorded on")
+
+        try:
+            header, events = read_recording(args.transcript)
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"Could not read {args.transcript}: {e}")
+    else:
+        transcript = load_transcript(args.transcript)
+
+    workspace = tempfile.TemporaryDirectory(prefix="replay-workspace-") if args.synthetic else contextlib.nullcontext(args.workspace)
+
+    with workspace as workspace_dir:
+        if args.synthetic:
+            print(f"Replay \u2014 generating a synthetic workspace of about {args.synthetic} files")
+            synthetic_workspace(workspace_dir, args.synthetic)
+
+        os.chdir(workspace_dir)
+
+        for directory in (responder.MAIN_DIR, responder.FOUNDATION_DIR, responder.AI_SUPPORT_DIR):
+            if not Path(directory).is_dir():
+                raise SystemExit(f"Workspace {Path.cwd()} has no {directory}/ directory")
+
+        if args.transcript.endswith(".jsonl.gz"):
+            for root, sha in header.get("heads", {}).items():
+                if sha and repo_head_sha(root) != sha:
+                    print(f"Warning: {root}/ is not at the recorded commit {sha[:12]}, tool results will differ")
+
+            responder.configure_project(header["project"])
+            result = asyncio.run(replay_tools(header, events))
+            print_tool_summary(result)
+
+            if report:
+                report.write_text(json.dumps(result, indent=2))
+                print(f"Replay report written to {report}")
+
+            return
+
+        os.environ.setdefault("COPILOT_GITHUB_TOKEN", "replay")
+        os.environ["PROJECT_ID"] = transcript["event"].get("PROJECT_ID") or os.environ.get("PROJECT_ID", "")
+
+        results = []
+
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory(prefix="replay-") as tmp:
+                results.append(asyncio.run(replay_once(transcript, Path(tmp))))
+
+        print_summary(results)
+
+        if report:
+            report.write_text(json.dumps(results, indent=2))
+            print(f"Replay report written to {report}")
+
+        if any(result["error"] for result in results):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import math
+import re
+from pathlib import Path
+
+from code_index import tokenize
+
+
+BM25_K1 = 1.2
+BM25_B  = 0.75
+
+MAX_SNIPPET_CHARS = 1200
+
+FRONTMATTER_PATTERN = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+SECTION_PATTERN     = re.compile(r"^##\s+(.+)$", re.MULTILINE)
+BULLET_SPLIT        = re.compile(r"^(?=- )", re.MULTILINE)
+
+
+def skill_passages(skill):
+    """Split a SKILL.md into passages: one per `##` section, or one per top-level
+    bullet for list sections (vocabulary entries, common mistakes), so a single
+    matching entry can be quoted without the rest of its section."""
+
+    try:
+        content = Path(skill["path"]).read_text(errors="replace")
+    except OSError:
+        return []
+
+    content  = FRONTMATTER_PATTERN.sub("", content)
+    matches  = list(SECTION_PATTERN.finditer(content))
+    passages = []
+
+    for i, match in enumerate(matches):
+        heading = match.group(1).strip()
+        end     = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        body    = content[match.end():end].strip()
+        kind    = "vocabulary" if heading.lower().startswith("vocabulary") else "skill"
+        bullets = [chunk.split("\n\n")[0].strip() for chunk in BULLET_SPLIT.split(body) if chunk.startswith("- ")]
+
+        for text in (bullets if len(bullets) > 1 else [body]):
+            if text:
+                passages.append({"kind": kind, "source": skill["path"], "title": f"{skill['dir']} › {heading}", "text": text})
+
+    return passages
+
+
+def insight_passages(insights):
+    passages = []
+
+    for i in insights:
+        topic = i.get("topic", "general")
+        tag   = topic if i.get("scope", "project") == "project" else f"global/{topic}"
+
+        passages.append({"kind": "insight", "source": f"#{i.get('issue', '?')}", "title": tag, "text": i.get("insight", "")})
+
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over a small in-memory passage list, using the code search
+    tokenizer so config keys and camelCase names match their parts."""
+
+    def __init__(self, passages):
+        self.passages = passages
+        self.counts   = []
+        self.df       = {}
+
+        for passage in passages:
+            counts = {}
+
+            for term in tokenize(f"{passage['title']}\n{passage['text']}"):
+                counts[term] = counts.get(term, 0) + 1
+
+            self.counts.append(counts)
+
+            for term in counts:
+                self.df[term] = self.df.get(term, 0) + 1
+
+        self.lengths    = [sum(counts.values()) for counts in self.counts]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def idf(self, term):
+        df = self.df.get(term, 0)
+        return math.log(1 + (len(self.passages) - df + 0.5) / (df + 0.5))
+
+    def rank(self, query, limit):
+        """Return up to `limit` (score, passage) pairs with a positive score, best first."""
+
+        terms  = set(tokenize(query)) & set(self.df)
+        scores = []
+
+        for passage, counts, length in zip(self.passages, self.counts, self.lengths):
+            score = 0.0
+            norm  = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length)
+
+            for term in terms:
+                tf = counts.get(term, 0)
+
+                if tf:
+                    score += self.idf(term) * tf * (BM25_K1 + 1) / (tf + norm)
+
+            if score > 0:
+                scores.append((score, passage))
+
+        scores.sort(key=lambda x: -x[0])
+        return scores[:limit]
+
+
+def format_ranked_passages(ranked):
+    lines = []
+
+    for score, passage in ranked:
+        text = passage["text"]
+
+        if len(text) > MAX_SNIPPET_CHARS:
+            text = text[:MAX_SNIPPET_CHARS].rstrip() + " ..."
+
+        if passage["kind"] == "insight":
+            label = f"Insight [{passage['title']}] from issue {passage['source']}"
+        else:
+            label = f"{passage['kind'].capitalize()} `{passage['title']}` ({passage['source']})"
+
+        lines.append(f"### {label} (score {score:.1f})\n{text}")
+
+    return "\n\n".join(lines)
@@ -0,0 +1,380 @@
+import asyncio
+import contextvars
+import functools
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from copilot import define_tool
+
+
+RUN_REPORT_VERSION = 1
+RECORDING_VERSION  = 1
+
+LATENCY_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300)
+
+OTHER_PHASE = "Other"
+
+current_phase = contextvars.ContextVar("current_phase", default=OTHER_PHASE)
+current_trace = contextvars.ContextVar("current_trace", default="")
+raised_error  = contextvars.ContextVar("raised_error", default=None)
+
+
+def bucket_label(index):
+    if index < len(LATENCY_BUCKETS):
+        return f"<={LATENCY_BUCKETS[index]:g}s"
+
+    return f">{LATENCY_BUCKETS[-1]:g}s"
+
+
+class LatencyHistogram:
+    """Call count, total and max duration, and counts per LATENCY_BUCKETS bucket."""
+
+    def __init__(self):
+        self.count   = 0
+        self.errors  = 0
+        self.total   = 0.0
+        self.max     = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, seconds, ok=True):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+
+        self.count          += 1
+        self.errors         += int(not ok)
+        self.total          += seconds
+        self.max             = max(self.max, seconds)
+        self.buckets[index] += 1
+
+    def to_dict(self):
+        return {
+            "calls": self.count,
+            "errors": self.errors,
+            "total_seconds": round(self.total, 3),
+            "avg_seconds": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_seconds": round(self.max, 3),
+            "buckets": {bucket_label(i): n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class PhaseStats:
+    COUNTERS = (
+        "runs", "sessions", "prompts", "turns", "tool_calls", "tool_errors",
+        "prompt_chars", "response_chars", "input_tokens", "output_tokens",
+        "cache_read_tokens", "retries", "nudges", "timeouts", "failures",
+    )
+
+    def __init__(self):
+        self.wall     = 0.0
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.tools    = {}
+
+    def to_dict(self):
+        return {
+            "wall_seconds": round(self.wall, 3),
+            **self.counters,
+            "tools": {name: histogram.to_dict() for name, histogram in sorted(self.tools.items())},
+        }
+
+
+class RunReport:
+    """Per-phase timings and counters for one responder process.
+
+    The phase is carried in a context variable, so `with report.phase(...)`
+    around an awaited step attributes every prompt, turn and tool call made
+    underneath it, including those of tasks it starts. Batch and daemon runs
+    add the numbers of all their issues together.
+    """
+
+    def __init__(self):
+        self.lock       = threading.Lock()
+        self.started_at = time.time()
+        self.started    = time.perf_counter()
+        self.issues     = 0
+        self.phases     = {}
+
+    def stats(self, phase):
+        stats = self.phases.get(phase)
+
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+
+        return stats
+
+    @contextmanager
+    def phase(self, name):
+        token   = current_phase.set(name)
+        started = time.perf_counter()
+
+        self.count("runs", phase=name)
+
+        try:
+            yield
+        finally:
+            current_phase.reset(token)
+
+            with self.lock:
+                self.stats(name).wall += time.perf_counter() - started
+
+    def count(self, counter, amount=1, phase=None):
+        with self.lock:
+            self.stats(phase or current_phase.get()).counters[counter] += amount
+
+    def record_tool(self, name, seconds, ok=True, phase=None):
+        with self.lock:
+            stats = self.stats(phase or current_phase.get())
+
+            stats.tools.setdefault(name, LatencyHistogram()).add(seconds, ok)
+            stats.counters["tool_errors"] += int(not ok)
+
+    def record_issue(self):
+        with self.lock:
+            self.issues += 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "version": RUN_REPORT_VERSION,
+                "started_at": self.started_at,
+                "wall_seconds": round(time.perf_counter() - self.started, 3),
+                "issues": self.issues,
+                "latency_buckets": [bucket_label(i) for i in range(len(LATENCY_BUCKETS) + 1)],
+                "phases": {name: stats.to_dict() for name, stats in self.phases.items()},
+            }
+
+    def summary(self):
+        with self.lock:
+            return ", ".join(
+                f"{name} {stats.wall:.1f}s / {stats.counters['turns']} turn(s) / {stats.counters['tool_calls']} tool call(s)"
+                for name, stats in self.phases.items()
+            )
+
+    def write(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+        os.replace(f.name, path)
+
+
+def arguments_hash(arguments):
+    encoded = json.dumps(arguments, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+class ToolTracer:
+    """Spans of custom tool calls: arguments hash, duration, result size and
+    error class, exported per issue as Chrome trace JSON (chrome://tracing,
+    ui.perfetto.dev). The error class is the exception a tool raised,
+    "ErrorResult" for the "Error: ..." strings tools return, or "ToolFailure"
+    when the SDK rejected the call before the tool ran.
+
+    The SDK runs tool handlers in its own tasks, so spans are attributed through
+    the session id of the invocation, which `bind` maps to the issue trace and
+    phase that sent the prompt. Tool bodies run in worker threads, so a slow
+    fetch, subprocess or scan never blocks the event loop every session shares.
+    """
+
+    def __init__(self):
+        self.lock     = threading.Lock()
+        self.origin   = time.perf_counter()
+        self.sessions = {}
+        self.spans    = {}
+
+    def bind(self, session_id, phase):
+        if session_id:
+            with self.lock:
+                self.sessions[session_id] = (current_trace.get(), phase)
+
+    def tool(self, lock=None, **kwargs):
+        """Drop-in replacement for `@define_tool(...)` that traces every call and
+        runs it in a worker thread, holding `lock` if given. Tools that change
+        shared state, or iterate state other tools change, pass the lock that
+        guards it."""
+
+        def decorator(fn):
+            def run(*args):
+                try:
+                    with lock or nullcontext():
+                        return fn(*args)
+                except Exception as e:
+                    holder = raised_error.get()
+
+                    if holder is not None:
+                        holder[0] = type(e).__name__
+
+                    raise
+
+            @functools.wraps(fn)
+            def call(*args):
+                return asyncio.to_thread(run, *args)
+
+            defined = define_tool(**kwargs)(call)
+            handler = defined.handler
+
+            async def traced_handler(invocation):
+                raised_error.set([None])
+                started = time.perf_counter()
+                result  = await handler(invocation)
+                text    = result.text_result_for_llm or ""
+                error   = raised_error.get()[0]
+
+                if error is None and result.result_type == "failure":
+                    error = "ToolFailure"
+                elif error is None and text.startswith("Error"):
+                    error = "ErrorResult"
+
+                self.record(defined.name, invocation, started, time.perf_counter(), len(text.encode()), error)
+
+                return result
+
+            defined.handler = traced_handler
+
+            return defined
+
+        return decorator
+
+    def record(self, tool_name, invocation, started, ended, result_bytes, error):
+        with self.lock:
+            trace, phase = self.sessions.get(invocation.session_id, ("", OTHER_PHASE))
+
+            self.spans.setdefault(trace, []).append({
+                "tool": tool_name,
+                "phase": phase,
+                "start": started - self.origin,
+                "duration": ended - started,
+                "args_hash": arguments_hash(invocation.arguments),
+                "result_bytes": result_bytes,
+                "error": error,
+            })
+
+    def drain(self, trace):
+        """Remove and return the spans of one trace, forgetting its sessions."""
+
+        with self.lock:
+            self.sessions = {sid: bound for sid, bound in self.sessions.items() if bound[0] != trace}
+
+            return self.spans.pop(trace, [])
+
+    def export(self, path, trace):
+        """Write the spans of `trace` to `path` as Chrome trace JSON, one track
+        per phase, unless it has none. Returns the number of spans written."""
+
+        spans = self.drain(trace)
+
+        if not spans:
+            return 0
+
+        phases = list(dict.fromkeys(span["phase"] for span in spans))
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": phase}}
+            for tid, phase in enumerate(phases, 1)
+        ]
+
+        for span in spans:
+            events.append({
+                "name": span["tool"],
+                "cat": "error" if span["error"] else "tool",
+                "ph": "X",
+                "pid": 1,
+                "tid": phases.index(span["phase"]) + 1,
+                "ts": round(span["start"] * 1_000_000),
+                "dur": round(span["duration"] * 1_000_000),
+                "args": {key: span[key] for key in ("args_hash", "result_bytes", "error")},
+            })
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+
+        return len(spans)
+
+
+def event_fields(etype, data):
+    """The recorded part of a session event: tool name, call id and arguments
+    when a tool starts, success and result size when it completes, text sizes
+    of messages and token counts of usage events."""
+
+    def field(name):
+        return getattr(data, name, None)
+
+    if etype == "tool.execution_start":
+        return {"tool": field("tool_name"), "call": field("tool_call_id"), "args": field("arguments")}
+
+    if etype == "tool.execution_complete":
+        result = field("result")
+        return {"call": field("tool_call_id"), "ok": field("success"), "result_bytes": len((getattr(result, "content", None) or "").encode())}
+
+    if etype in ("assistant.message", "assistant.reasoning"):
+        return {"chars": len(field("content") or "")}
+
+    if etype in ("assistant.message_delta", "assistant.reasoning_delta"):
+        return {"chars": len(field("delta_content") or "")}
+
+    if etype == "assistant.usage":
+        return {"input_tokens": field("input_tokens"), "output_tokens": field("output_tokens")}
+
+    return {}
+
+
+class SessionRecorder:
+    """Every event of the sessions of an issue, kept in memory per trace (see
+    ToolTracer) and written as gzip JSONL when the issue is done. The first line
+    describes the recording; each later line is one event with its offset in
+    seconds, session id, phase, type and event_fields()."""
+
+    def __init__(self):
+        self.lock        = threading.Lock()
+        self.origin      = time.perf_counter()
+        self.origin_wall = time.time()
+        self.traces      = {}
+
+    def record(self, trace, session_id, phase, etype, **fields):
+        row = {"t": round(time.perf_counter() - self.origin, 4), "session": session_id, "phase": phase, "type": etype, **fields}
+
+        with self.lock:
+            self.traces.setdefault(trace, []).append(row)
+
+    def export(self, path, trace, header):
+        """Write the events of `trace` after a header line, unless it has none.
+        Returns the number of events written."""
+
+        with self.lock:
+            rows = self.traces.pop(trace, [])
+
+        if not rows:
+            return 0
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with gzip.open(path, "wt") as f:
+            f.write(json.dumps({"type": "recording", "version": RECORDING_VERSION, "started_at": self.origin_wall + rows[0]["t"], **header}, default=str) + "\n")
+
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+
+        return len(rows)
+
+
+def read_recording(path):
+    """Return (header, events) of a recording written by SessionRecorder."""
+
+    with gzip.open(path, "rt") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    if not rows or rows[0].get("type") != "recording":
+        raise ValueError(f"{path} is not a session recording")
+
+    if rows[0].get("version") != RECORDING_VERSION:
+        raise ValueError(f"unsupported session recording version {rows[0].get('version')}")
+
+    return rows[0], rows[1:]